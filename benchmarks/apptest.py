@@ -0,0 +1,41 @@
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.pages_manager import PagesManager
+from streamlit.source_util import page_icon_and_name
+from streamlit.util import calc_md5
+
+
+# Function to let AppTest run st.navigation page files; its pages manager has no script cache,
+# so they would otherwise render empty
+def run_page_scripts():
+    def page_bytecode(pages_manager, script_path):
+        with open(script_path) as script:
+            return compile(script.read(), script_path, "exec")
+    PagesManager.get_page_script_byte_code = page_bytecode
+
+
+# Function to let several AppTests run at once from different threads, like sessions on one server.
+# Each AppTest run installs a mock Runtime and config override and removes them when it finishes,
+# which would pull them out from under any other session still running; instead every run
+# shares one runtime (so media files and caches are shared, as on a real server) and the
+# app-testing config option stays on.
+def share_runtime():
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.set_option("global.appTest", True)
+    return runtime
+
+
+# Function to open a page on the next run; AppTest.switch_page hashes the file path, but
+# st.navigation looks pages up by their URL path
+def switch_page(at, page):
+    at._page_hash = calc_md5(page_icon_and_name(Path(page))[1])
@@ -0,0 +1,239 @@
+"""Load-test the app with many sessions at once, fully offline.
+
+Usage:
+    python -m benchmarks.bench_load [--sessions 1 4 8] [--rows 1000 10000] [--output FILE]
+
+Each session is a Streamlit AppTest running main.py, the way the server runs one
+browser tab. All sessions run at once on threads of one process, sharing the
+worker pool and caches like sessions on the deployed app. A session:
+
+  1. opens the app (Instructions page, through main.py's navigation),
+  2. opens Download Template, picks a service category and gets its template,
+  3. opens Upload Template and uploads a synthetic filled-in template, rerunning
+     every --poll seconds (as the page's progress display does) until the ZIP
+     download appears.
+
+Sessions cycle through the --rows sizes and the service categories. Each one gets
+its own synthetic file, so no session is served from another's cached result.
+Each --sessions level runs in a fresh process. For each action the level reports
+latency percentiles, plus upload throughput and the process's peak memory.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.bench_pipeline import DATA_DIR, RESULTS_DIR, git_commit, input_file
+from utils.schema import SERVICE_CATEGORIES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SESSIONS = [1, 4, 8]
+DEFAULT_ROWS = [1_000, 10_000]
+
+TEMPLATE_PAGE = "views/2_download_template.py"
+UPLOAD_PAGE = "views/3_upload_template.py"
+
+# session state key holding the file each session's upload widget returns (AppTest has no file uploader)
+UPLOADS_KEY = "_load_test_uploads"
+
+ACTIONS = ["open_app", "template", "upload_rerun", "upload"]
+PERCENTILES = [50, 90, 99]
+
+
+# Function to pick each session's service category, row count and synthetic file
+def session_plan(sessions, rows_list, data_dir=DATA_DIR):
+    plan = []
+    for session in range(sessions):
+        service_rendered = SERVICE_CATEGORIES[session % len(SERVICE_CATEGORIES)]
+        rows = rows_list[session % len(rows_list)]
+        plan.append({"service": service_rendered, "rows": rows,
+                     "path": input_file(service_rendered, rows, "xlsx", data_dir, seed=session + 1)})
+    return plan
+
+
+# Function to make st.file_uploader return whatever the session put in its state under the widget's key
+def patch_file_uploader():
+    import streamlit as st
+
+    def file_uploader(label, *args, key=None, **kwargs):
+        return st.session_state.get(UPLOADS_KEY, {}).get(key)
+    st.file_uploader = file_uploader
+
+
+# Function to run one session through the three pages, recording each action's latency
+def run_session(session, step, poll, timeout):
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.apptest import switch_page
+
+    timings = {action: [] for action in ACTIONS}
+    result = {"rows": step["rows"], "service": step["service"], "timings": timings, "error": None}
+
+    def timed(action, at):
+        start = time.perf_counter()
+        at.run()
+        timings[action].append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    try:
+        at = AppTest.from_file("main.py", default_timeout=timeout)
+        timed("open_app", at)
+
+        switch_page(at, TEMPLATE_PAGE)
+        at.run()
+        at.selectbox[0].select(step["service"])
+        timed("template", at)
+        if not at.get("download_button"):
+            raise RuntimeError("no template download")
+
+        with open(step["path"], "rb") as file:
+            data = file.read()
+        name = os.path.basename(step["path"])
+        uploaded = UploadedFile(UploadedFileRec(f"session-{session}", name, "application/octet-stream", data), None)
+        at.session_state[UPLOADS_KEY] = {None: uploaded}
+        switch_page(at, UPLOAD_PAGE)
+
+        start = time.perf_counter()
+        timed("upload_rerun", at)
+        while not at.get("download_button"):
+            if at.error:
+                raise RuntimeError(at.error[0].value)
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"upload not done after {timeout}s")
+            time.sleep(poll)
+            timed("upload_rerun", at)
+        timings["upload"].append(time.perf_counter() - start)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+# Samples this process's resident memory until stopped, keeping the peak (Linux only; elsewhere
+# the peak comes from getrusage)
+class MemorySampler(threading.Thread):
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        if not os.path.exists("/proc/self/statm"):
+            return
+        page_mb = os.sysconf("SC_PAGE_SIZE") / 2**20
+        while not self._stopped.is_set():
+            with open("/proc/self/statm") as statm:
+                rss_mb = int(statm.read().split()[1]) * page_mb
+            self.peak_mb = max(self.peak_mb or 0.0, rss_mb)
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+# Function to run every session of one level at once inside this (fresh) process
+def run_level(plan, poll, timeout):
+    from utils.diagnostics import peak_rss_mb
+
+    from benchmarks.apptest import run_page_scripts, share_runtime
+
+    os.chdir(ROOT)
+    run_page_scripts()
+    share_runtime()
+    patch_file_uploader()
+
+    start_mb = peak_rss_mb()
+    sampler = MemorySampler()
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(plan)) as executor:
+        sessions = list(executor.map(lambda args: run_session(*args, poll, timeout), enumerate(plan)))
+    wall = time.perf_counter() - start
+    sampler.stop()
+
+    return {"sessions": sessions, "wall_seconds": wall, "start_rss_mb": start_mb,
+            "peak_rss_mb": round(sampler.peak_mb, 1) if sampler.peak_mb else peak_rss_mb()}
+
+
+# Function to summarize a level: per-action latency percentiles, upload throughput and memory
+def summarize(level, report):
+    sessions = report["sessions"]
+    completed = [session for session in sessions if not session["error"]]
+    summary = {"sessions": level, "completed": len(completed), "wall_seconds": round(report["wall_seconds"], 2),
+               "uploads_per_minute": round(60 * len(completed) / report["wall_seconds"], 2),
+               "rows_per_second": round(sum(session["rows"] for session in completed) / report["wall_seconds"]),
+               "start_rss_mb": report["start_rss_mb"], "peak_rss_mb": report["peak_rss_mb"],
+               "errors": [session["error"] for session in sessions if session["error"]], "latency": {}}
+    for action in ACTIONS:
+        values = [value for session in sessions for value in session["timings"][action]]
+        if values:
+            summary["latency"][action] = {"count": len(values), "max": round(max(values), 3),
+                                          **{f"p{p}": round(float(np.percentile(values, p)), 3)
+                                             for p in PERCENTILES}}
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n{summary['sessions']} concurrent session(s): {summary['completed']} completed in "
+          f"{summary['wall_seconds']:.1f}s, {summary['uploads_per_minute']:.1f} uploads/min, "
+          f"{summary['rows_per_second']:,} rows/s, peak RSS {summary['peak_rss_mb']:.0f} MB "
+          f"(from {summary['start_rss_mb']:.0f} MB)")
+    print(f"  {'action':<14}{'count':>7}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES) + f"{'max':>9}")
+    for action, stats in summary["latency"].items():
+        print(f"  {action:<14}{stats['count']:>7}" + "".join(f"{stats[f'p{p}']:>8.3f}s" for p in PERCENTILES)
+              + f"{stats['max']:>8.3f}s")
+    for error in summary["errors"]:
+        print(f"  error: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_load",
+                                     description="Load-test the app with concurrent in-process sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS,
+                        help="concurrent sessions per level (default: 1 4 8)")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="upload sizes, cycled through the sessions (default: 1000 10000)")
+    parser.add_argument("--poll", type=float, default=0.5, help="seconds between reruns while scrubbing")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds before a session gives up")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        plan = session_plan(args.sessions[0], args.rows)
+        print(json.dumps(run_level(plan, args.poll, args.timeout)))
+        return 0
+
+    summaries = []
+    for level in args.sessions:
+        # synthetic files are written before the level starts, so generating them isn't timed
+        session_plan(level, args.rows)
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_load", "--child", "--sessions", str(level),
+             "--rows", *map(str, args.rows), "--poll", str(args.poll), "--timeout", str(args.timeout)],
+            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        summary = summarize(level, json.loads(output.strip().splitlines()[-1]))
+        print_summary(summary)
+        summaries.append(summary)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({"commit": commit, "rows": args.rows, "poll": args.poll, "levels": summaries}, file, indent=2)
+    print(f"\nResults written to {output}")
+    return 1 if any(summary["errors"] for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
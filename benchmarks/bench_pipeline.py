@@ -0,0 +1,217 @@
+"""Benchmark the upload-to-ZIP pipeline stage by stage.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--rows 1000 10000 ...] [--services ...] [--output FILE]
+    python -m benchmarks.bench_pipeline --compare OLD.json NEW.json
+
+Synthetic templates are generated (and cached on disk) for each service
+category from the same schema the template page uses. Each stage of
+scrub_data and package_zip is timed, and its peak traced memory is
+recorded. Results are written as JSON named after the current commit.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_template
+from utils.dates import parse_dates
+from utils.readers import detect_service_type, peek_upload, read_upload
+from utils.scrub import check_columns, package_zip, scrub_data
+from utils.schema import COLUMN_DTYPES, SERVICE_CATEGORIES
+from utils.unique_id import build_unique_ids
+from utils.validation import validate_rows
+from utils.writers import typed_columns, write_csv, write_parquet, write_xlsx
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000, 1_000_000]
+DATA_DIR = os.path.join(tempfile.gettempdir(), "worth-bench")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+# Function to get the current commit, so results can be compared between commits
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Function to write (or reuse) a synthetic template file for a service and row count; other
+# seeds give files with different rows
+def input_file(service_rendered, rows, file_format, data_dir=DATA_DIR, seed=0):
+    os.makedirs(data_dir, exist_ok=True)
+    suffix = f"_{seed}" if seed else ""
+    path = os.path.join(data_dir, f"{service_rendered.replace(' ', '')}_{rows}{suffix}.{file_format}")
+    if not os.path.exists(path):
+        df = synthetic_template(service_rendered, rows, seed=seed)
+        if file_format == "csv":
+            df.to_csv(path, index=False)
+        else:
+            with open(path, "wb") as file:
+                write_xlsx(file, df, sheet_name="Sheet1")
+    return path
+
+
+# Time one stage and record its peak traced memory
+class Stage:
+    def __init__(self, results, name, track_memory):
+        self.results = results
+        self.name = name
+        self.track_memory = track_memory
+
+    def __enter__(self):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        result = {"stage": self.name, "seconds": round(time.perf_counter() - self.start, 4)}
+        if self.track_memory:
+            result["peak_mb"] = round((tracemalloc.get_traced_memory()[1] - self.start_memory) / 2**20, 2)
+        self.results.append(result)
+
+
+# Function to run every pipeline stage on one template file
+def bench_file(path, track_memory=True):
+    stages = []
+    original_filename = os.path.basename(path)
+
+    with open(path, "rb") as uploaded_file:
+        with Stage(stages, "peek_validate", track_memory):
+            peek_df = peek_upload(uploaded_file)
+            service_type = detect_service_type(peek_df)
+            check_columns(list(peek_df.columns), service_type)
+
+        with Stage(stages, "read", track_memory):
+            df = read_upload(uploaded_file)
+
+    with Stage(stages, "validate", track_memory):
+        validate_rows(df, service_type)
+
+    dates_df = df[["Date of Birth", "Service Completion Date"]].copy()
+    with Stage(stages, "parse_dates", track_memory):
+        dates_df["Date of Birth"], _ = parse_dates(dates_df["Date of Birth"])
+        dates_df["Service Completion Date"], _ = parse_dates(dates_df["Service Completion Date"])
+
+    with Stage(stages, "unique_id", track_memory):
+        build_unique_ids(df["Name"], dates_df["Date of Birth"])
+
+    with Stage(stages, "scrub_data", track_memory):
+        keep_df, keep_filename, send_df, send_filename, error_msg, warnings = scrub_data(
+            df, original_filename, service_type)
+    if error_msg:
+        raise RuntimeError(error_msg)
+
+    with Stage(stages, "write_keep", track_memory):
+        write_xlsx(io.BytesIO(), keep_df)
+
+    with Stage(stages, "write_send", track_memory):
+        write_xlsx(io.BytesIO(), send_df)
+
+    with Stage(stages, "write_send_csv", track_memory):
+        write_csv(io.BytesIO(), typed_columns(send_df, COLUMN_DTYPES))
+
+    with Stage(stages, "write_send_parquet", track_memory):
+        write_parquet(io.BytesIO(), typed_columns(send_df, COLUMN_DTYPES))
+
+    with Stage(stages, "package_zip", track_memory):
+        zip_buffer = io.BytesIO()
+        package_zip(zip_buffer, keep_df, keep_filename, send_df, send_filename)
+
+    return stages, {"rows": len(df), "columns": len(df.columns),
+                    "file_mb": round(os.path.getsize(path) / 2**20, 2),
+                    "zip_mb": round(len(zip_buffer.getvalue()) / 2**20, 2)}
+
+
+def run(rows_list, services, file_format, track_memory):
+    if track_memory:
+        tracemalloc.start()
+
+    results = []
+    for rows in rows_list:
+        for service_rendered in services:
+            path = input_file(service_rendered, rows, file_format)
+            stages, info = bench_file(path, track_memory)
+            total = sum(stage["seconds"] for stage in stages if stage["stage"] != "package_zip")
+            print(f"{service_rendered:<28}{rows:>10,} rows  {total:8.2f}s  "
+                  + "  ".join(f"{stage['stage']}={stage['seconds']:.2f}" for stage in stages))
+            for stage in stages:
+                results.append({"service": service_rendered, "rows": rows, "format": file_format,
+                                **info, **stage})
+
+    if track_memory:
+        tracemalloc.stop()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "track_memory": track_memory,
+        "results": results,
+    }
+
+
+# Function to print per-stage time ratios between two result files
+def compare(old_path, new_path):
+    with open(old_path) as file:
+        old = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+
+    key = lambda result: (result["service"], result["rows"], result["format"], result["stage"])
+    old_results = {key(result): result for result in old["results"]}
+
+    print(f"{'service':<28}{'rows':>10}  {'stage':<14}{old['commit']:>10}{new['commit']:>10}  ratio")
+    for result in new["results"]:
+        previous = old_results.get(key(result))
+        if previous is None:
+            continue
+        ratio = result["seconds"] / previous["seconds"] if previous["seconds"] else float("nan")
+        flag = "  <- slower" if ratio > 1.2 else ""
+        print(f"{result['service']:<28}{result['rows']:>10,}  {result['stage']:<14}"
+              f"{previous['seconds']:>10.3f}{result['seconds']:>10.3f}  {ratio:5.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_pipeline",
+                                     description="Benchmark the upload-to-ZIP pipeline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--services", nargs="+", default=SERVICE_CATEGORIES, choices=SERVICE_CATEGORIES)
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip tracemalloc (memory tracing slows every stage down)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two results files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    report = run(args.rows, args.services, args.format, not args.no_memory)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
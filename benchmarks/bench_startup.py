@@ -0,0 +1,86 @@
+"""Measure how long a cold app process takes to render its first page.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N] [--page PAGE] [--then PAGE] [--pause SECONDS]
+
+Each run starts a new Python process (so nothing is imported or cached yet),
+loads Streamlit's test harness (patched to run st.navigation page files, which
+it otherwise skips), and times the first run of main.py showing
+--page. After --pause seconds, roughly how long a user spends reading that
+page, it times opening --then. Medians over the runs are printed.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PAGE = "views/1_instructions.py"
+DEFAULT_THEN = "views/3_upload_template.py"
+
+
+# Function to time one cold start inside this (fresh) process; Streamlit itself is imported
+# before the clock starts, since every deployment pays for it the same way
+def measure(page, then, pause):
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.apptest import run_page_scripts, switch_page
+
+    run_page_scripts()
+    os.chdir(ROOT)
+    at = AppTest.from_file("main.py", default_timeout=300)
+    if page != DEFAULT_PAGE:
+        switch_page(at, page)
+
+    start = time.perf_counter()
+    at.run()
+    result = {"first_render": time.perf_counter() - start, "errors": len(at.exception)}
+
+    if then:
+        time.sleep(pause)
+        switch_page(at, then)
+        start = time.perf_counter()
+        at.run()
+        result["second_render"] = time.perf_counter() - start
+        result["errors"] += len(at.exception)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_startup",
+                                     description="Time the app's first render in fresh processes.")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh processes (default: 5)")
+    parser.add_argument("--page", default=DEFAULT_PAGE, help=f"page rendered first (default: {DEFAULT_PAGE})")
+    parser.add_argument("--then", default=DEFAULT_THEN, help=f"page opened next (default: {DEFAULT_THEN})")
+    parser.add_argument("--pause", type=float, default=3.0,
+                        help="seconds spent on the first page before opening the next (default: 3)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.page, args.then, args.pause)))
+        return 0
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--page", args.page,
+             "--then", args.then, "--pause", str(args.pause)],
+            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'first render':<16}{args.page:<34}{statistics.median(r['first_render'] for r in results):8.3f}s")
+    if args.then:
+        print(f"{'then':<16}{args.then:<34}{statistics.median(r['second_render'] for r in results):8.3f}s")
+    if any(r["errors"] for r in results):
+        print("warning: some runs raised exceptions")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
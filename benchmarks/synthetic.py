@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from utils.schema import COUNSELING_SERVICE_OPTIONS, HAS_SOLD_OPTIONS, get_schema
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+               "David", "Elizabeth", "Keisha", "Jamal", "Maria", "Jose", "Nguyen", "Aaliyah"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+              "Rodriguez", "Martinez", "Washington", "Jackson", "Lee", "Thompson", "White", "Harris"]
+COUNTIES = ["Fulton", "DeKalb", "Cobb", "Gwinnett", "Clayton", "Henry", "Cherokee", "Douglas"]
+RACES = ["White", "Black", "Asian", "American Indian", "Pacific Islander", "Two or More", "Other"]
+ETHNICITIES = ["Hispanic", "Non-Hispanic"]
+LANGUAGES = ["English", "Spanish", "Vietnamese", "Korean", "Other"]
+GENDERS = ["Female", "Male", "Non-binary"]
+ORGANIZATIONS = ["Atlanta Housing Partners", "Southside CDC", "Metro Counseling Services"]
+
+
+# Function to build a filled-in template for a service category with the given number of rows
+def synthetic_template(service_rendered, rows, seed=0, missing_rate=0.02):
+    rng = np.random.default_rng(seed)
+    columns = get_schema(service_rendered).columns
+
+    first = rng.choice(FIRST_NAMES, rows)
+    last = rng.choice(LAST_NAMES, rows)
+    dobs = pd.Timestamp("1940-01-01") + pd.to_timedelta(rng.integers(0, 30000, rows), unit="D")
+    completion = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+
+    data = {
+        "Service": [service_rendered] * rows,
+        "Submitting Organization": rng.choice(ORGANIZATIONS, rows),
+        # partners type completion dates in a mix of real dates and text
+        "Service Completion Date": np.where(rng.random(rows) < 0.5,
+                                            completion.strftime("%m/%d/%Y").to_numpy(dtype=object),
+                                            completion.to_pydatetime()),
+        "Counseling Service Rendered": rng.choice(COUNSELING_SERVICE_OPTIONS, rows),
+        "Name": np.char.add(np.char.add(first, " "), last),
+        "Date of Birth": dobs,
+        "Street Address": np.char.add(rng.integers(1, 9999, rows).astype(str), " Peachtree St"),
+        "Unit (if applicable)": np.where(rng.random(rows) < 0.3, "Apt 2", None),
+        "County": rng.choice(COUNTIES, rows),
+        "ZIP": rng.integers(30002, 30350, rows),
+        "Race": rng.choice(RACES, rows),
+        "Ethnicity": rng.choice(ETHNICITIES, rows),
+        "Primary Language": rng.choice(LANGUAGES, rows),
+        "Gender": rng.choice(GENDERS, rows),
+        "HH Income": rng.integers(8000, 150000, rows),
+        "HH Size": rng.integers(1, 8, rows),
+        "Existing Homeowner (Y/N)": rng.choice(["Y", "N"], rows),
+        "First-Generation Homeowner (Y/N)": rng.choice(["Y", "N"], rows),
+        "1st Time Home Buyer (Y/N)": rng.choice(["Y", "N"], rows),
+        "Has Sold?": rng.choice(HAS_SOLD_OPTIONS, rows),
+    }
+    df = pd.DataFrame({col: data[col] for col in columns})
+
+    # blank out a few optional and date cells the way real submissions do
+    for col in ["Date of Birth", "Service Completion Date", "HH Income"]:
+        df.loc[rng.random(rows) < missing_rate, col] = None
+
+    return df
@@ -1,4 +1,5 @@
 import streamlit as st
+from utils.warmup import start_warmup
 
 # - - - PAGE SETUP - - -
 home = st.Page(
@@ -20,6 +21,12 @@ upload_template = st.Page(
     icon=':material/upload:'
 )
 
+consolidate_send_files = st.Page(
+    page='views/4_consolidate.py',
+    title='4 - Consolidate SEND Files',
+    icon=':material/merge:'
+)
+
 
 # - - - NAVIGATION SETUP - - -
 pg = st.navigation(
@@ -27,6 +34,7 @@ pg = st.navigation(
         home,
         download_template,
         upload_template,
+        consolidate_send_files,
     ])
 
 
@@ -47,3 +55,7 @@ hide_default_format = """
 
 # inject the CSS
 st.markdown(hide_default_format, unsafe_allow_html=True)
+
+# import the data engines and pre-build every template in the background, once per process,
+# so the page above renders without waiting for them
+start_warmup()
@@ -0,0 +1,97 @@
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from utils.consolidate import DATASET_SCHEMA, UniqueIdIndex, consolidate
+from utils.scrub import package_zip, scrub_data
+
+SERVICE = "Housing Counseling"
+ANN, ANN_DOB = "Ann Lee", "04/12/1980"
+
+
+# A small Housing Counseling upload with one row per (name, DOB)
+def _upload(people, organization="Southside CDC"):
+    rows = len(people)
+    return pd.DataFrame({
+        "Service": [SERVICE] * rows,
+        "Submitting Organization": [organization] * rows,
+        "Service Completion Date": ["01/15/2024"] * rows,
+        "Counseling Service Rendered": ["Home Purchase"] * rows,
+        "Name": [name for name, _ in people],
+        "Date of Birth": [dob for _, dob in people],
+        "Street Address": ["1 Main St"] * rows,
+        "Unit (if applicable)": [None] * rows,
+        "County": ["Fulton"] * rows,
+        "ZIP": [30303] * rows,
+        "Race": ["Black"] * rows,
+        "Ethnicity": ["Non-Hispanic"] * rows,
+        "Primary Language": ["English"] * rows,
+        "Gender": ["Female"] * rows,
+        "HH Income": [52000] * rows,
+        "HH Size": [3] * rows,
+        "Existing Homeowner (Y/N)": ["N"] * rows,
+        "First-Generation Homeowner (Y/N)": ["Y"] * rows,
+    })
+
+
+# Function to scrub an upload into a downloaded ZIP with its SEND file in the given formats
+def _downloaded_zip(df, send_formats, name="upload_cleaned.zip"):
+    keep_df, keep_filename, send_df, send_filename, error, _ = scrub_data(df, "upload.xlsx", SERVICE)
+    assert error is None
+    buffer = io.BytesIO()
+    package_zip(buffer, keep_df, keep_filename, send_df, send_filename, send_formats=send_formats)
+    buffer.name = name
+    return buffer
+
+
+# Function to consolidate sources into Parquet bytes; returns the report and the dataset
+def _consolidate(sources):
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, DATASET_SCHEMA) as writer:
+        report = consolidate(sources, writer, UniqueIdIndex())
+    return report, pq.read_table(io.BytesIO(buffer.getvalue())).to_pandas()
+
+
+def test_send_file_in_several_formats_is_read_once():
+    df = _upload([(ANN, ANN_DOB), ("Bo Chen", "06/30/1975"), ("Cy Diaz", "11/02/1990")])
+
+    report, dataset = _consolidate([_downloaded_zip(df, ("xlsx", "csv", "parquet"))])
+
+    assert len(report) == 1
+    assert report.loc[0, "File"].endswith("_SEND.parquet")
+    assert report.loc[0, "Error"] is None
+    assert (report.loc[0, "Rows"], report.loc[0, "Duplicates"]) == (len(df), 0)
+    assert len(dataset) == len(df)
+
+
+# Function to consolidate sources and name the result like the page's download
+def _consolidated_file(sources):
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, DATASET_SCHEMA) as writer:
+        consolidate(sources, writer, UniqueIdIndex())
+    buffer.seek(0)
+    buffer.name = "consolidated_SEND.parquet"
+    return buffer
+
+
+def test_earlier_consolidation_keeps_its_flags_in_any_order():
+    first = _downloaded_zip(_upload([(ANN, ANN_DOB), ("Bo Chen", "06/30/1975"), (ANN, ANN_DOB)]), ("parquet",), "first.zip")
+    earlier = _consolidated_file([first])
+    earlier_rows = pq.read_table(earlier).to_pandas()
+    assert earlier_rows["Duplicate"].tolist() == [False, False, True]
+
+    results = []
+    for order in ([earlier, "new"], ["new", earlier]):
+        new = _downloaded_zip(_upload([(ANN, ANN_DOB), ("Cy Diaz", "11/02/1990")], "Metro Counseling"), ("parquet",), "new.zip")
+        report, dataset = _consolidate([new if source == "new" else source for source in order])
+        results.append((report.sort_values("File", ignore_index=True), dataset))
+
+        old, added = dataset.iloc[:len(earlier_rows)], dataset.iloc[len(earlier_rows):]
+        assert old["Duplicate"].tolist() == earlier_rows["Duplicate"].tolist()
+        assert old["Repeat Participant"].tolist() == earlier_rows["Repeat Participant"].tolist()
+        # Ann Lee was already consolidated; Cy Diaz is new
+        assert added["Repeat Participant"].tolist() == [True, False]
+
+    pd.testing.assert_frame_equal(results[0][0], results[1][0])
+    pd.testing.assert_frame_equal(results[0][1], results[1][1])
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from utils.dates import parse_dates
+
+
+def test_text_serials_parsed_and_years_failed():
+    values = pd.Series(["44927", "44927.5", "01/15/2024", "1980", "20240115", None, ""], dtype=object)
+
+    parsed, failed = parse_dates(values)
+
+    assert parsed.tolist()[:3] == [pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-01 12:00"),
+                                   pd.Timestamp("2024-01-15")]
+    # a year or a yyyymmdd number isn't a plausible serial, so it's left blank and counted
+    assert parsed.iloc[3:].isna().all()
+    assert failed == 2
+
+
+def test_numeric_cells_are_serials():
+    parsed, failed = parse_dates(pd.Series([44927, None, "2024-01-15"], dtype=object))
+
+    assert parsed.tolist()[0] == pd.Timestamp("2023-01-01")
+    assert parsed.tolist()[2] == pd.Timestamp("2024-01-15")
+    assert failed == 0
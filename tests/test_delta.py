@@ -0,0 +1,68 @@
+import io
+
+import pandas as pd
+import pytest
+
+from utils.delta import Delta, load_fingerprints
+from utils.scrub import package_zip, scrub_data
+
+SERVICE = "Housing Counseling"
+
+
+# A small upload with blank dates, numbers stored as numbers and text, and a blank ZIP
+def _upload():
+    return pd.DataFrame({
+        "Service": [SERVICE] * 4,
+        "Submitting Organization": ["Southside CDC", "Southside CDC", "Metro Counseling", "Metro Counseling"],
+        "Service Completion Date": ["01/15/2024", None, "2024-02-01", "03/05/2024"],
+        "Counseling Service Rendered": ["Home Purchase", "Other", "Rental Counseling", None],
+        "Name": ["Ann Lee", "Bo Chen", "Cy Diaz", "Di Evans"],
+        "Date of Birth": ["04/12/1980", "1975-06-30", None, "11/02/1990"],
+        "Street Address": ["1 Main St", "2 Oak Ave", "3 Pine Rd", "4 Elm Ct"],
+        "Unit (if applicable)": [None, "Apt 2", None, None],
+        "County": ["Fulton", "DeKalb", "Cobb", "Fulton"],
+        "ZIP": [30303, 30030, None, 30318],
+        "Race": ["Black", "Asian", "White", None],
+        "Ethnicity": ["Non-Hispanic", "Non-Hispanic", "Hispanic", "Non-Hispanic"],
+        "Primary Language": ["English", "Korean", "Spanish", "English"],
+        "Gender": ["Female", "Male", "Female", "Non-binary"],
+        "HH Income": [52000, 61000.5, None, 38000],
+        "HH Size": [3, 1, 4, None],
+        "Existing Homeowner (Y/N)": ["N", "Y", "N", "N"],
+        "First-Generation Homeowner (Y/N)": ["Y", "N", "Y", None],
+    })
+
+
+# Function to scrub the upload into a downloaded ZIP whose KEEP file is in one format
+def _previous_zip(df, keep_format):
+    keep_df, keep_filename, send_df, send_filename, error, _ = scrub_data(df, "upload.xlsx", SERVICE)
+    assert error is None
+    buffer = io.BytesIO()
+    package_zip(buffer, keep_df, keep_filename, send_df, send_filename, keep_formats=(keep_format,))
+    buffer.name = "upload_cleaned.zip"
+    return buffer
+
+
+@pytest.mark.parametrize("keep_format", ["xlsx", "csv", "parquet"])
+def test_previous_keep_round_trip(keep_format):
+    df = _upload()
+    delta = Delta(load_fingerprints(_previous_zip(df, keep_format)))
+
+    keep_df, _, _, _, error, _ = scrub_data(df, "upload.xlsx", SERVICE, delta=delta)
+
+    assert error is None
+    assert (delta.new, delta.changed, delta.unchanged) == (0, 0, len(df))
+    assert keep_df.empty
+
+
+@pytest.mark.parametrize("keep_format", ["xlsx", "csv", "parquet"])
+def test_changed_row_detected(keep_format):
+    df = _upload()
+    delta = Delta(load_fingerprints(_previous_zip(df, keep_format)))
+
+    df.loc[1, "HH Income"] = 70000
+    keep_df, _, _, _, error, _ = scrub_data(df, "upload.xlsx", SERVICE, delta=delta)
+
+    assert error is None
+    assert (delta.new, delta.changed, delta.unchanged) == (0, 1, len(df) - 1)
+    assert keep_df["Name"].tolist() == ["Bo Chen"]
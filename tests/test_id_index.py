@@ -0,0 +1,64 @@
+import pandas as pd
+
+from utils.id_index import IdIndex
+
+DOB = pd.Timestamp("1980-04-12")
+
+
+# Function to record one batch of (Unique ID, name) rows, all with the same DOB
+def _check(index, rows, source="upload.xlsx"):
+    unique_ids = pd.Series([unique_id for unique_id, _ in rows], dtype=object)
+    names = pd.Series([name for _, name in rows], dtype=object)
+    dates_of_birth = pd.Series([DOB] * len(rows))
+    organizations = pd.Series(["Southside CDC"] * len(rows), dtype=object)
+    return index.check_and_record(unique_ids, names, dates_of_birth, organizations, source)
+
+
+def test_shared_id_within_batch(tmp_path):
+    with IdIndex(tmp_path / "index.sqlite") as index:
+        within, historical = _check(index, [("nle-1234", "Ann Lee"), ("nle-1234", "Ann Leo"), ("bch-5678", "Bo Chen")])
+
+    assert within.tolist() == [True, True, False]
+    assert not historical.any()
+
+
+def test_rescrubbing_same_file_has_no_historical_collisions(tmp_path):
+    rows = [("nle-1234", "Ann Lee"), ("nle-1234", "Ann Leo"), ("bch-5678", "Bo Chen")]
+    with IdIndex(tmp_path / "index.sqlite") as index:
+        _check(index, rows)
+        within, historical = _check(index, rows)
+
+    assert within.tolist() == [True, True, False]
+    assert not historical.any()
+
+
+def test_same_person_again_is_not_a_collision(tmp_path):
+    with IdIndex(tmp_path / "index.sqlite") as index:
+        _check(index, [("nle-1234", "Ann Lee")], source="q1.xlsx")
+        within, historical = _check(index, [("nle-1234", "Ann Lee"), ("nle-1234", "Ann Lee")], source="q2.xlsx")
+
+    assert not within.any()
+    assert not historical.any()
+
+
+def test_different_person_in_earlier_submission(tmp_path):
+    with IdIndex(tmp_path / "index.sqlite") as index:
+        _check(index, [("nle-1234", "Ann Lee")], source="q1.xlsx")
+        within, historical = _check(index, [("nle-1234", "Ann Leo"), ("bch-5678", "Bo Chen")], source="q2.xlsx")
+
+    assert not within.any()
+    assert historical.tolist() == [True, False]
+
+
+def test_shared_id_with_earlier_submission(tmp_path):
+    with IdIndex(tmp_path / "index.sqlite") as index:
+        _check(index, [("nle-1234", "Ann Lee")], source="q1.xlsx")
+        within, historical = _check(index, [("nle-1234", "Ann Leo"), ("nle-1234", "Ann Lee"), ("bch-5678", "Bo Chen")],
+                                    source="q2.xlsx")
+        # Ann Leo is in the index now, so Ann Lee on her own collides with an earlier submission
+        _, later_historical = _check(index, [("nle-1234", "Ann Lee")], source="q3.xlsx")
+
+    # Ann Leo shares the ID with Ann Lee, who is in this batch too, so it's flagged within the batch
+    assert within.tolist() == [True, True, False]
+    assert not historical.any()
+    assert later_historical.tolist() == [True]
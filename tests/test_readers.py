@@ -0,0 +1,28 @@
+import io
+
+import pandas as pd
+
+from utils import readers
+
+
+def test_peek_reads_first_rows_with_openpyxl(monkeypatch):
+    buffer = io.BytesIO()
+    pd.DataFrame({"Service": ["Education"] * 100, "Name": [f"Person {i}" for i in range(100)]}).to_excel(
+        buffer, index=False)
+    buffer.name = "upload.xlsx"
+
+    # calamine parses the whole sheet up front, so a peek must not use it even when it's installed
+    iter_xlsx_rows = readers._iter_xlsx_rows
+    engines = []
+
+    def recording_iter_xlsx_rows(file, calamine):
+        engines.append(calamine)
+        return iter_xlsx_rows(file, calamine=False)
+
+    monkeypatch.setattr(readers, "HAS_CALAMINE", True)
+    monkeypatch.setattr(readers, "_iter_xlsx_rows", recording_iter_xlsx_rows)
+    peek = readers.peek_upload(buffer, nrows=10)
+
+    assert engines == [False]
+    assert len(peek) == 10
+    assert list(peek.columns) == ["Service", "Name"]
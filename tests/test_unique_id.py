@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.unique_id import REFERENCE_DATE, build_unique_ids
+
+
+# Original row-by-row implementation, kept as the reference the vectorized version must match
+def legacy_unique_ids(names, dates_of_birth, reference_date=REFERENCE_DATE):
+    days_old = ((dates_of_birth -
+                reference_date).dt.days).astype(str).apply(lambda x: x[::2])
+
+    name_format = names.astype(str).str.replace(
+        ' ', '', regex=True).str.lower().apply(lambda x: x[1:][::3]).str[:4].str.ljust(4, 'x')
+
+    unique_ids = name_format.astype(str) + "-" + days_old.astype(str)
+
+    # Zero-pad all values to the same length as the max value
+    max_length = unique_ids.str.len().max()
+    return unique_ids.apply(lambda x: x.ljust(max_length, '0'))
+
+
+# Regression fixture: edge cases the legacy lambdas produced, plus a large random batch
+def _regression_fixture(n_random=100_000, seed=0):
+    cases = pd.DataFrame({
+        'Name': ['Ann Lee', 'Bo', '', ' ', None, np.nan, 12345, 'İstanbul Öz', 'ÉLODIE  DURAND',
+                 'Mary-Jane  O\'Neil', 'x', 'Jo Ann Van Der Berg'],
+        'Date of Birth': ['2000-01-01', '1920-01-02', '1920-01-03', None, '1901-06-30', '1985-12-31',
+                          'not a date', '2024-02-29', '1950-07-04', '1999-09-09', '1920-01-01', '1975-03-15'],
+    })
+    cases['Date of Birth'] = pd.to_datetime(cases['Date of Birth'], errors='coerce')
+
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list("abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    lengths = rng.integers(0, 25, n_random)
+    random_names = ["".join(rng.choice(alphabet, n)) for n in lengths]
+    random_dobs = REFERENCE_DATE + pd.to_timedelta(rng.integers(-5000, 40000, n_random), unit='D')
+    bulk = pd.DataFrame({'Name': random_names, 'Date of Birth': random_dobs})
+
+    # with and without missing DOBs, since a single NaT changes how day counts print
+    with_missing = bulk.copy()
+    with_missing.loc[with_missing.sample(frac=0.05, random_state=seed).index, 'Date of Birth'] = pd.NaT
+
+    return [cases, cases.dropna(subset=['Date of Birth']), bulk, with_missing, bulk.iloc[:0]]
+
+
+@pytest.mark.parametrize("frame", _regression_fixture(), ids=["cases", "cases_with_dob", "bulk", "missing_dob", "empty"])
+def test_matches_legacy(frame):
+    expected = legacy_unique_ids(frame['Name'], frame['Date of Birth'])
+    actual = build_unique_ids(frame['Name'], frame['Date of Birth'])
+    if len(frame):
+        pd.testing.assert_series_equal(actual, expected, check_dtype=False)
+    else:
+        assert actual.empty
@@ -0,0 +1,150 @@
+"""Scrub a batch of completed templates from the command line.
+
+Usage:
+    python -m utils.batch INPUT [INPUT ...] [--output-dir DIR] [--workers N]
+                          [--keep-format FORMAT ...] [--send-format FORMAT ...]
+                          [--id-index FILE] [--previous FILE]
+
+Each INPUT is a directory (every .xlsx/.csv inside it), a glob pattern, or a
+file. Each template produces the same KEEP/SEND ZIP as the upload page, and
+files are processed in parallel across a pool of worker processes. KEEP and
+SEND are written as xlsx unless other formats (xlsx, csv, parquet) are given.
+With --id-index, every file's Unique IDs are checked against (and added to) a
+SQLite index of earlier submissions. With --previous (a ZIP, KEEP file or
+fingerprints file from an earlier run), only rows that are new or changed
+since then are scrubbed.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.delta import Delta, load_fingerprints
+from utils.scrub import (UploadError, load_upload, package_zip, scrub_data, unique_stems, validate_upload,
+                         zip_file_name)
+from utils.writers import DEFAULT_FORMATS, OUTPUT_FORMATS
+
+TEMPLATE_EXTENSIONS = (".csv", ".xlsx")
+
+
+# Function to expand directories and glob patterns into a sorted list of template files
+# (or other files with the given extensions)
+def find_templates(inputs, extensions=TEMPLATE_EXTENSIONS):
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = glob.glob(os.path.join(item, "*"))
+        else:
+            candidates = glob.glob(item, recursive=True) or [item]
+        paths.update(path for path in candidates
+                     if os.path.isfile(path) and path.endswith(extensions)
+                     and not os.path.basename(path).startswith("~$"))
+    return sorted(paths)
+
+
+# Function to scrub one template into a ZIP in output_dir (runs in a worker process); the ZIP is
+# named after zip_stem (default: the file's name)
+def scrub_file(path, output_dir, keep_formats=DEFAULT_FORMATS, send_formats=DEFAULT_FORMATS, id_index=None,
+               previous=None, zip_stem=None):
+    start = time.perf_counter()
+    original_filename = os.path.basename(path)
+    result = {"file": path, "zip": None, "rows": 0, "error": None}
+
+    try:
+        with open(path, "rb") as uploaded_file:
+            service_type, df = load_upload(uploaded_file)
+    except (UploadError, OSError) as e:
+        result["error"] = str(e)
+        return result
+
+    result["rows"] = len(df)
+    issues, validation_warnings = validate_upload(df, service_type)
+    delta = Delta(previous) if previous is not None else None
+    result["issues"] = len(issues)
+    keep_df, keep_filename, send_df, send_filename, error_msg, warnings = scrub_data(
+        df, original_filename, service_type, id_index=id_index, delta=delta)
+    result["warnings"] = validation_warnings + warnings
+    if error_msg:
+        result["error"] = error_msg
+        return result
+
+    zip_path = os.path.join(output_dir, zip_file_name(zip_stem or original_filename))
+    try:
+        package_zip(zip_path, keep_df, keep_filename, send_df, send_filename,
+                    keep_formats=keep_formats, send_formats=send_formats,
+                    fingerprints=delta.fingerprints if delta else None)
+    except Exception as e:
+        result["error"] = f"An error occurred during data processing: {str(e)}"
+        return result
+    result["zip"] = zip_path
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# Function to scrub many templates in parallel, returning one result per file; files with the
+# same name in different directories get numbered ZIPs (report, report_2, ...)
+def run_batch(paths, output_dir, workers=None, keep_formats=DEFAULT_FORMATS, send_formats=DEFAULT_FORMATS,
+              id_index=None, previous=None):
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(scrub_file, paths, [output_dir] * len(paths),
+                                 [keep_formats] * len(paths), [send_formats] * len(paths), [id_index] * len(paths),
+                                 [previous] * len(paths), unique_stems(paths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.batch",
+        description="Scrub completed WORTH Grant templates into KEEP/SEND ZIP files.")
+    parser.add_argument("inputs", nargs="+", help="template files, directories, or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="cleaned",
+                        help="directory for the output ZIP files (default: ./cleaned)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: one per CPU core)")
+    parser.add_argument("--keep-format", nargs="+", choices=OUTPUT_FORMATS, default=list(DEFAULT_FORMATS),
+                        help="format(s) of the KEEP file (default: xlsx)")
+    parser.add_argument("--send-format", nargs="+", choices=OUTPUT_FORMATS, default=list(DEFAULT_FORMATS),
+                        help="format(s) of the SEND file (default: xlsx); csv/parquet skip the spreadsheet writer")
+    parser.add_argument("--id-index", metavar="FILE",
+                        help="SQLite Unique ID index to check for IDs shared by different participants "
+                             "across submissions (created if missing)")
+    parser.add_argument("--previous", metavar="FILE",
+                        help="ZIP, KEEP file or fingerprints file from an earlier run; only rows new or "
+                             "changed since then are scrubbed")
+    args = parser.parse_args(argv)
+
+    paths = find_templates(args.inputs)
+    if not paths:
+        parser.error("no .xlsx or .csv templates found")
+
+    previous = None
+    if args.previous:
+        try:
+            with open(args.previous, "rb") as previous_file:
+                previous = load_fingerprints(previous_file)
+        except Exception as e:
+            parser.error(f"could not read the previous submission: {e}")
+
+    start = time.perf_counter()
+    results = run_batch(paths, args.output_dir, args.workers,
+                        tuple(dict.fromkeys(args.keep_format)), tuple(dict.fromkeys(args.send_format)), args.id_index,
+                        previous)
+
+    failed = 0
+    for result in results:
+        if result["error"]:
+            failed += 1
+            print(f"FAILED  {result['file']}: {result['error']}")
+        else:
+            print(f"OK      {result['file']} ({result['rows']} rows, {result['seconds']:.1f}s) -> {result['zip']}")
+            for warning in result["warnings"]:
+                print(f"        warning: {warning}")
+
+    print(f"{len(results) - failed} of {len(results)} templates scrubbed in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
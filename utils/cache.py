@@ -0,0 +1,62 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+# total size of parsed uploads and finished ZIPs kept in memory across all sessions
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+# Function to hash the raw bytes of an upload
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Function to estimate how much memory a cached value holds
+def size_of(value):
+    # DataFrames, checked by their method so importing the cache doesn't import pandas
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(size_of(item) for item in value)
+    if isinstance(value, dict):
+        return sum(size_of(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+# Thread-safe least-recently-used cache bounded by the total size of its values
+class LRUCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        nbytes = size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            # values larger than the whole budget are never cached
+            if nbytes > self.max_bytes:
+                return
+
+            # evict the least recently used entries until the new value fits
+            while self._entries and self.current_bytes + nbytes > self.max_bytes:
+                self.current_bytes -= self._entries.popitem(last=False)[1][1]
+
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,431 @@
+"""Merge SEND files from many organizations into one Parquet dataset.
+
+Usage:
+    python -m utils.consolidate INPUT [INPUT ...] --dataset DIR
+                                [--report FILE] [--participants FILE]
+
+Each INPUT is a SEND file (.xlsx, .csv or .parquet), a ZIP downloaded from the
+upload page (every SEND file inside it is used, read from its Parquet,
+CSV or XLSX copy in that order of preference), a directory, or a glob
+pattern. Files are read a chunk at a time and checked against the SEND columns
+for their service type. Their rows are converted to one shared column layout
+and appended to DIR as a new Parquet part file once the whole file has been
+read, so a file that fails partway through adds nothing. Memory stays
+proportional to one file's converted (Arrow) rows plus the Unique ID index. Each row is flagged as a duplicate when
+the same participant, organization, service and completion date was already
+consolidated, and as a repeat participant when its Unique ID was seen before.
+An INPUT may also be an earlier consolidated Parquet file: its rows are copied
+with the flags they already have, and indexed before any SEND file is flagged.
+"""
+import argparse
+import glob
+import io
+import os
+import re
+import sys
+import time
+import uuid
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from utils.batch import find_templates
+from utils.dates import parse_dates
+from utils.readers import detect_service_type, map_uniques, read_xlsx_streaming
+from utils.schema import COLUMN_DTYPES, COLUMNS, UNIQUE_ID, get_schema
+from utils.scrub import UploadError
+from utils.unique_id import canonical_unique_ids
+from utils.validation import to_number
+from utils.writers import CHUNK_ROWS, text_values
+
+SEND_EXTENSIONS = (".xlsx", ".csv", ".parquet", ".zip")
+
+# SEND entries inside a downloaded ZIP (single uploads or one folder per file)
+SEND_ENTRY = re.compile(r'_SEND\.(xlsx|csv|parquet)$')
+
+# a ZIP may hold the same SEND file in several formats; the first of these is read
+SEND_FORMAT_PREFERENCE = (".parquet", ".csv", ".xlsx")
+
+# columns added to every consolidated row
+SOURCE_FILE = "Source File"
+DUPLICATE = "Duplicate"
+REPEAT = "Repeat Participant"
+
+# a visit is one participant receiving one service from one organization on one date
+VISIT_COLUMNS = [UNIQUE_ID, "Submitting Organization", "Service", "Service Completion Date"]
+
+PII_COLUMNS = frozenset(column.name for column in COLUMNS if column.pii)
+
+
+# Function to lay out the consolidated dataset: every non-PII column of every service type in
+# template order, with the Unique ID where the PII columns were, then the added columns
+def _dataset_columns():
+    first_pii = next(i for i, column in enumerate(COLUMNS) if column.pii)
+    names = [column.name for column in COLUMNS[:first_pii]] + [UNIQUE_ID]
+    names += [column.name for column in COLUMNS[first_pii:] if not column.pii]
+    return names + [SOURCE_FILE]
+
+
+ARROW_TYPES = {"date": pa.date32(), "number": pa.float64(), "integer": pa.int64()}
+
+DATASET_COLUMNS = _dataset_columns()
+ROW_SCHEMA = pa.schema([(col, ARROW_TYPES.get(COLUMN_DTYPES.get(col), pa.string())) for col in DATASET_COLUMNS])
+DATASET_SCHEMA = ROW_SCHEMA.append(pa.field(DUPLICATE, pa.bool_())).append(pa.field(REPEAT, pa.bool_()))
+
+
+# Every Unique ID consolidated so far, with the visits and sources it was seen in
+class UniqueIdIndex:
+    def __init__(self):
+        self.visits = set()
+        self.participants = {}  # Unique ID -> [visits, organizations, services, files]
+
+    # Function to flag a table's rows against everything indexed so far (including earlier
+    # rows of the same table), then add them to the index. New chunks and rows read back from
+    # the dataset are converted without pandas metadata, so their visit keys hash the same way.
+    def flag(self, table):
+        frame = table.select(VISIT_COLUMNS + [SOURCE_FILE]).to_pandas(ignore_metadata=True)
+        visit_keys = pd.util.hash_pandas_object(frame[VISIT_COLUMNS], index=False).to_numpy()
+        duplicate = np.zeros(len(frame), dtype=bool)
+        repeat = np.zeros(len(frame), dtype=bool)
+
+        rows = zip(visit_keys, frame[UNIQUE_ID], frame["Submitting Organization"], frame["Service"],
+                   frame[SOURCE_FILE])
+        for i, (visit, unique_id, organization, service, source) in enumerate(rows):
+            if visit in self.visits:
+                duplicate[i] = True
+                continue
+            self.visits.add(visit)
+
+            participant = self.participants.get(unique_id)
+            if participant is None:
+                self.participants[unique_id] = [1, {organization}, {service}, {source}]
+            else:
+                repeat[i] = True
+                participant[0] += 1
+                participant[1].add(organization)
+                participant[2].add(service)
+                participant[3].add(source)
+
+        return duplicate, repeat
+
+    # Function to list every participant seen in more than one visit
+    def repeat_participants(self):
+        records = [
+            (unique_id, visits, *("; ".join(sorted(str(value) for value in values if not pd.isna(value)))
+                                  for values in (organizations, services, files)))
+            for unique_id, (visits, organizations, services, files) in self.participants.items()
+            if visits > 1
+        ]
+        participants = pd.DataFrame(records, columns=[UNIQUE_ID, "Visits", "Organizations", "Services", "Files"])
+        return participants.sort_values(["Visits", UNIQUE_ID], ascending=[False, True], ignore_index=True)
+
+    # Function to index the rows already in a consolidated dataset without re-flagging them
+    def add_dataset(self, paths):
+        for path in paths:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=CHUNK_ROWS,
+                                                            columns=VISIT_COLUMNS + [SOURCE_FILE]):
+                self.flag(pa.Table.from_batches([batch]))
+
+
+# Function to yield (name, file object) for each SEND file in a source: a path or an uploaded
+# file with a .name; ZIPs yield each SEND entry they contain. Only files with one of the given
+# extensions are yielded (ZIP entries are not read otherwise).
+def _send_files(source, extensions=SEND_FORMAT_PREFERENCE):
+    name = os.path.basename(source if isinstance(source, str) else source.name)
+    if not name.endswith(SEND_EXTENSIONS):
+        raise UploadError(f"{name} is not a SEND file (.xlsx, .csv, .parquet or .zip).")
+
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            yield from _send_files_in(name, file, extensions)
+    else:
+        source.seek(0)
+        yield from _send_files_in(name, source, extensions)
+
+
+def _send_files_in(name, file, extensions):
+    if not name.endswith(".zip"):
+        if name.endswith(extensions):
+            yield name, file
+        return
+
+    with zipfile.ZipFile(file) as archive:
+        # one entry per SEND file (the same file may be there in several formats)
+        send_entries = {}
+        for entry in archive.namelist():
+            if not SEND_ENTRY.search(entry):
+                continue
+            stem, extension = os.path.splitext(entry)
+            chosen = send_entries.get(stem)
+            if chosen is None or (SEND_FORMAT_PREFERENCE.index(extension)
+                                  < SEND_FORMAT_PREFERENCE.index(os.path.splitext(chosen)[1])):
+                send_entries[stem] = entry
+        if not send_entries:
+            raise UploadError(f"{name} does not contain any SEND files.")
+        for entry in send_entries.values():
+            if not entry.endswith(extensions):
+                continue
+            # one SEND file at a time; Parquet and XLSX readers need to seek
+            yield f"{name}/{entry}", io.BytesIO(archive.read(entry))
+
+
+# Function to read a SEND file a chunk at a time (CSV and Parquet are streamed)
+def _read_chunks(name, file):
+    if name.endswith(".parquet"):
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=CHUNK_ROWS):
+            yield batch.to_pandas()
+    elif name.endswith(".csv"):
+        # read as text so ZIPs keep their leading zeros
+        yield from pd.read_csv(file, dtype=str, chunksize=CHUNK_ROWS)
+    else:
+        yield read_xlsx_streaming(file)
+
+
+# Function to raise an UploadError unless a file has its service type's SEND columns and no PII
+def check_send_columns(name, columns, service_type):
+    pii_columns = [col for col in columns if col in PII_COLUMNS]
+    if pii_columns:
+        raise UploadError(f"{name} contains PII column(s): {', '.join(pii_columns)}. "
+                          f"Only SEND files can be consolidated.")
+
+    schema = get_schema(service_type)
+    present = set(columns)
+    missing_columns = [col for col in schema.send_columns if col not in present and col not in schema.optional]
+    if missing_columns:
+        raise UploadError(f"{name} is missing the following SEND column(s): {', '.join(missing_columns)}.")
+
+
+# Function to convert a number column, leaving values that aren't numbers empty
+def _numbers(values, blank):
+    return to_number(values.mask(blank))
+
+
+# Function to convert a whole-number column, leaving values that aren't whole numbers empty
+def _integers(values, blank):
+    numbers = to_number(values.mask(blank))
+    return numbers.where(numbers % 1 == 0).astype("Int64")
+
+
+CONVERTERS = {"number": _numbers, "integer": _integers}
+
+
+# Function to convert each distinct value of a column once and map the results back to every
+# row; returns the column and the number of non-blank values that didn't convert
+def _convert(values, convert):
+    def convert_uniques(uniques):
+        uniques = pd.Series(uniques, dtype=object)
+        blank = uniques.astype(str).str.strip().eq('')
+        converted = convert(uniques, blank)
+        return converted.array, (converted.isna() & ~blank).to_numpy(dtype=bool)
+
+    converted, failed = map_uniques(values, convert_uniques, fill=(None, False))
+    return pd.Series(converted, index=values.index), int(failed.sum())
+
+
+# Function to convert a SEND chunk to the dataset's columns and types (ROW_SCHEMA). Rows
+# without a Unique ID are dropped, values that don't convert are left empty, and columns the
+# dataset doesn't have are ignored. Returns the table, the number of dropped rows and of
+# emptied values.
+def conform(chunk, source):
+    unique_ids = chunk[UNIQUE_ID]
+    has_id = unique_ids.notna() & unique_ids.astype(str).str.strip().ne('')
+    chunk = chunk[has_id]
+
+    columns = {}
+    invalid = 0
+    for col in DATASET_COLUMNS:
+        if col not in chunk.columns:
+            columns[col] = pd.Series(None, index=chunk.index, dtype="string")
+            continue
+
+        dtype = COLUMN_DTYPES.get(col)
+        if dtype == "date":
+            dates, failed = parse_dates(chunk[col])
+            columns[col] = dates.dt.normalize().astype(pd.ArrowDtype(pa.date32()))
+        else:
+            columns[col], failed = _convert(chunk[col], CONVERTERS.get(dtype, text_values))
+        invalid += failed
+
+    columns[UNIQUE_ID] = canonical_unique_ids(columns[UNIQUE_ID])
+    # rows re-read from an earlier consolidation keep their original source
+    if SOURCE_FILE not in chunk.columns:
+        columns[SOURCE_FILE] = pd.Series(source, index=chunk.index, dtype="string")
+
+    table = pa.Table.from_pandas(pd.DataFrame(columns, copy=False), schema=ROW_SCHEMA, preserve_index=False)
+    return table, int((~has_id).sum()), invalid
+
+
+REPORT_COLUMNS = ["File", "Service", "Rows", "Duplicates", "Repeat Participants", "Rows Without ID",
+                  "Invalid Values", "Error"]
+
+
+# Function to describe why a SEND file couldn't be consolidated
+def _error_message(e):
+    return str(e) if isinstance(e, UploadError) else f"Could not read the file: {str(e)}"
+
+
+# Function to consolidate one SEND file into an open ParquetWriter; returns its report row.
+# The whole file is read and converted before any of it is flagged or written, so a file that
+# fails partway through leaves nothing in the dataset or the index.
+def _consolidate_file(name, file, writer, index):
+    entry = {"File": name, "Service": None, "Rows": 0, "Duplicates": 0, "Repeat Participants": 0,
+             "Rows Without ID": 0, "Invalid Values": 0, "Error": None}
+    tables = []
+    try:
+        for chunk in _read_chunks(name, file):
+            if entry["Service"] is None:
+                # checked on the first chunk, before the rest of the file is read
+                entry["Service"] = detect_service_type(chunk)
+                check_send_columns(name, list(chunk.columns), entry["Service"])
+
+            table, dropped, invalid = conform(chunk, name)
+            tables.append(table)
+            entry["Rows Without ID"] += dropped
+            entry["Invalid Values"] += invalid
+    except Exception as e:
+        entry.update({"Rows Without ID": 0, "Invalid Values": 0, "Error": _error_message(e)})
+        return entry
+
+    for table in tables:
+        duplicate, repeat = index.flag(table)
+        writer.write_table(table.append_column(DUPLICATE, pa.array(duplicate))
+                           .append_column(REPEAT, pa.array(repeat)))
+        entry["Rows"] += len(table)
+        entry["Duplicates"] += int(duplicate.sum())
+        entry["Repeat Participants"] += int(repeat.sum())
+    return entry
+
+
+# Function to tell an earlier consolidation (a Parquet file with the columns consolidating adds)
+# from a SEND file
+def _is_consolidated(file):
+    try:
+        columns = pq.ParquetFile(file).schema_arrow.names
+    except Exception:
+        # not readable as Parquet; reported when it's read as a SEND file
+        return False
+    finally:
+        file.seek(0)
+    return SOURCE_FILE in columns and DUPLICATE in columns
+
+
+# Function to copy an earlier consolidation into an open ParquetWriter with the flags it was
+# written with, indexing its rows without flagging them again; returns its report row
+def _carry_over(name, file, writer, index):
+    entry = {"File": name, "Service": None, "Rows": 0, "Duplicates": 0, "Repeat Participants": 0,
+             "Rows Without ID": 0, "Invalid Values": 0, "Error": None}
+    try:
+        tables = [pa.Table.from_batches([batch]).cast(DATASET_SCHEMA)
+                  for batch in pq.ParquetFile(file).iter_batches(batch_size=CHUNK_ROWS, columns=DATASET_SCHEMA.names)]
+    except Exception as e:
+        entry["Error"] = _error_message(e)
+        return entry
+
+    for table in tables:
+        index.flag(table)
+        writer.write_table(table)
+        entry["Rows"] += len(table)
+        entry["Duplicates"] += pc.sum(table[DUPLICATE]).as_py() or 0
+        entry["Repeat Participants"] += pc.sum(table[REPEAT]).as_py() or 0
+    return entry
+
+
+# Function to consolidate SEND sources into an open ParquetWriter (DATASET_SCHEMA), flagging
+# rows against the index; returns one report row per SEND file. Earlier consolidations among the
+# sources are carried over first, whatever order they came in, so their rows keep their flags
+# and new rows are flagged against them. A failing file is reported and skipped, and the other
+# files in the same ZIP are still consolidated.
+def consolidate(sources, writer, index, progress=None):
+    sources = list(sources)
+    report = []
+    rows_written = 0
+    carried = set()
+    for number, source in enumerate(sources):
+        try:
+            for name, file in _send_files(source, extensions=(".parquet",)):
+                if _is_consolidated(file):
+                    entry = _carry_over(name, file, writer, index)
+                    report.append(entry)
+                    carried.add((number, name))
+                    rows_written += entry["Rows"]
+                    if progress is not None:
+                        progress(rows_written)
+        except Exception:
+            # the source itself couldn't be opened; reported below
+            pass
+
+    for number, source in enumerate(sources):
+        source_name = os.path.basename(source if isinstance(source, str) else source.name)
+        try:
+            for name, file in _send_files(source):
+                if (number, name) in carried:
+                    continue
+                entry = _consolidate_file(name, file, writer, index)
+                report.append(entry)
+                rows_written += entry["Rows"]
+                if progress is not None:
+                    progress(rows_written)
+        except Exception as e:
+            # the source itself couldn't be opened (e.g. not a ZIP, or no SEND files inside)
+            report.append({"File": source_name, "Error": _error_message(e)})
+
+    return pd.DataFrame(report, columns=REPORT_COLUMNS)
+
+
+# Function to append SEND sources to a dataset directory as a new part file, indexing the
+# parts already there first; returns the report and the index
+def consolidate_to_dataset(sources, dataset_dir, progress=None):
+    os.makedirs(dataset_dir, exist_ok=True)
+    index = UniqueIdIndex()
+    index.add_dataset(sorted(glob.glob(os.path.join(dataset_dir, "*.parquet"))))
+
+    part_path = os.path.join(dataset_dir, f"part-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+    with pq.ParquetWriter(part_path, DATASET_SCHEMA) as writer:
+        report = consolidate(sources, writer, index, progress)
+    if not report["Rows"].fillna(0).any():
+        os.remove(part_path)
+    return report, index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.consolidate",
+        description="Merge WORTH Grant SEND files into one Parquet dataset, flagging repeat participants.")
+    parser.add_argument("inputs", nargs="+", help="SEND files, downloaded ZIPs, directories, or glob patterns")
+    parser.add_argument("-d", "--dataset", default="consolidated",
+                        help="dataset directory new part files are added to (default: ./consolidated)")
+    parser.add_argument("--report", help="also write the per-file report to this CSV file")
+    parser.add_argument("--participants", help="also write every repeat participant to this CSV file")
+    args = parser.parse_args(argv)
+
+    paths = find_templates(args.inputs, SEND_EXTENSIONS)
+    if not paths:
+        parser.error("no .xlsx, .csv, .parquet or .zip SEND files found")
+
+    start = time.perf_counter()
+    report, index = consolidate_to_dataset(paths, args.dataset)
+
+    for entry in report.to_dict("records"):
+        if entry["Error"]:
+            print(f"FAILED  {entry['File']}: {entry['Error']}")
+        else:
+            print(f"OK      {entry['File']} ({entry['Rows']} rows, {entry['Duplicates']} duplicates, "
+                  f"{entry['Repeat Participants']} repeat participants)")
+
+    if args.report:
+        report.to_csv(args.report, index=False)
+    if args.participants:
+        index.repeat_participants().to_csv(args.participants, index=False)
+
+    failed = int(report["Error"].notna().sum())
+    print(f"{len(report) - failed} of {len(report)} SEND files consolidated into {args.dataset} "
+          f"in {time.perf_counter() - start:.1f}s ({len(index.participants):,} participants)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
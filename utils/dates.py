@@ -0,0 +1,130 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.readers import map_uniques
+
+# text values treated as an empty date
+NULL_TOKENS = {'', 'nan', 'NaN', 'NaT', 'None', 'N/A', 'n/a', 'NA', 'null', 'NULL'}
+
+# formats tried when detecting a column's dominant format, US month-first before day-first
+CANDIDATE_FORMATS = [
+    '%m/%d/%Y',
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%m/%d/%y',
+    '%m-%d-%Y',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %I:%M:%S %p',
+    '%Y/%m/%d',
+    '%d-%b-%Y',
+    '%d-%b-%y',
+    '%b %d, %Y',
+    '%B %d, %Y',
+    '%d/%m/%Y',
+]
+
+# number of distinct text values used to detect the dominant format
+SAMPLE_SIZE = 200
+
+# Excel stores dates as days since 1899-12-30; 2958465 is 9999-12-31
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+MAX_EXCEL_SERIAL = 2958465
+
+# numbers stored as text are read as Excel serials only when they have five digits (1927-05-18
+# to 2173-10-14), so a year such as "1980" is never read as a day in 1905
+TEXT_SERIAL_RANGE = (10_000, 100_000)
+
+
+# Function to convert Excel serial day numbers to datetimes (out-of-range values become NaT)
+def excel_serial_to_datetime(serials):
+    serials = np.asarray(serials, dtype='float64')
+    valid = (serials >= 1) & (serials <= MAX_EXCEL_SERIAL)
+    days = pd.to_timedelta(np.where(valid, serials, np.nan), unit='D')
+    return (EXCEL_EPOCH + days).to_numpy(dtype='datetime64[ns]')
+
+
+# Function to pick the format that parses the most values in a sample of distinct date strings
+def detect_format(strings, sample_size=SAMPLE_SIZE):
+    sample = pd.Series(strings[:sample_size], dtype=object)
+    best_format, best_count = None, 0
+    for date_format in CANDIDATE_FORMATS:
+        count = pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum()
+        if count > best_count:
+            best_format, best_count = date_format, count
+            if count == len(sample):
+                break
+    return best_format
+
+
+# Function to parse distinct date strings: Excel serials, then the dominant format, then per-value
+# inference. Numbers outside TEXT_SERIAL_RANGE are left unparsed, so they're counted as failed.
+def _parse_strings(strings):
+    parsed = np.full(len(strings), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    numbers = pd.to_numeric(pd.Series(strings, dtype=object), errors='coerce').to_numpy(dtype='float64')
+    is_number = ~np.isnan(numbers)
+    is_serial = is_number & (numbers >= TEXT_SERIAL_RANGE[0]) & (numbers < TEXT_SERIAL_RANGE[1])
+    parsed[is_serial] = excel_serial_to_datetime(numbers[is_serial])
+
+    remaining = ~is_number
+    date_format = detect_format(strings[remaining])
+    if date_format is not None:
+        parsed[remaining] = pd.to_datetime(
+            pd.Series(strings[remaining], dtype=object), format=date_format, errors='coerce').to_numpy()
+
+    # the few values in some other format fall back to per-value inference
+    leftover = remaining & np.isnat(parsed)
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(
+            pd.Series(strings[leftover], dtype=object), format='mixed', errors='coerce').to_numpy()
+
+    return parsed
+
+
+# Parse the distinct values of a column; returns the parsed dates and which non-blank values failed
+def _parse_uniques(uniques):
+    uniques = np.asarray(uniques, dtype=object)
+    parsed_uniques = np.full(len(uniques), np.datetime64('NaT'), dtype='datetime64[ns]')
+    is_blank = np.zeros(len(uniques), dtype=bool)
+
+    is_datetime = np.array([isinstance(value, (datetime.date, np.datetime64)) for value in uniques], dtype=bool)
+    is_number = np.array([isinstance(value, (int, float, np.integer, np.floating))
+                          and not isinstance(value, (bool, np.bool_)) for value in uniques], dtype=bool)
+    is_string = np.array([isinstance(value, str) for value in uniques], dtype=bool)
+
+    if is_datetime.any():
+        parsed_uniques[is_datetime] = pd.to_datetime(
+            pd.Series(uniques[is_datetime], dtype=object), errors='coerce').to_numpy(dtype='datetime64[ns]')
+    if is_number.any():
+        parsed_uniques[is_number] = excel_serial_to_datetime(uniques[is_number].astype('float64'))
+    if is_string.any():
+        strings = np.array([value.strip() for value in uniques[is_string]], dtype=object)
+        blank = np.isin(strings, list(NULL_TOKENS))
+        string_dates = np.full(len(strings), np.datetime64('NaT'), dtype='datetime64[ns]')
+        if (~blank).any():
+            string_dates[~blank] = _parse_strings(strings[~blank])
+        parsed_uniques[is_string] = string_dates
+        is_blank[np.flatnonzero(is_string)[blank]] = True
+
+    return parsed_uniques, np.isnat(parsed_uniques) & ~is_blank
+
+
+# Function to normalize a column of dates; returns the parsed column and the number of
+# non-empty values that could not be parsed
+def parse_dates(values):
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        # Arrow dates/timestamps (e.g. read back from Parquet) become datetime64 with NaT for blanks
+        if isinstance(values.dtype, pd.ArrowDtype):
+            values = values.astype('datetime64[ns]')
+        return values, 0
+
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        parsed = pd.Series(excel_serial_to_datetime(values.to_numpy(dtype='float64', na_value=np.nan)),
+                           index=values.index)
+        return parsed, int((values.notna() & parsed.isna()).sum())
+
+    # dates repeat heavily, so parse each distinct value once and map back
+    parsed, failed = map_uniques(values, _parse_uniques, fill=(np.datetime64('NaT'), False))
+    return pd.Series(parsed, index=values.index), int(failed.sum())
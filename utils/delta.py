@@ -0,0 +1,141 @@
+import io
+import os
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from utils.dates import parse_dates
+from utils.readers import detect_service_type, map_uniques, read_xlsx_streaming
+from utils.schema import COLUMN_DTYPES, UNIQUE_ID, get_schema
+from utils.unique_id import canonical_unique_ids
+from utils.writers import text_values
+
+# a submitted row is identified by its participant and service; its fingerprint covers every
+# KEEP column, so any edit to the row changes it
+KEY_COLUMNS = [UNIQUE_ID, "Service", "Submitting Organization", "Service Completion Date"]
+
+# columns of a stored fingerprint set (64-bit hashes, written as signed integers)
+FINGERPRINT_COLUMNS = ["Key", "Fingerprint"]
+
+# fingerprint file written next to the KEEP/SEND files in delta mode
+FINGERPRINT_SUFFIX = "_fingerprints.csv"
+
+# KEEP files inside a downloaded ZIP, used when it has no fingerprint file
+KEEP_ENTRY = re.compile(r'_KEEP\.(xlsx|csv|parquet)$')
+
+DATE_COLUMNS = [col for col, dtype in COLUMN_DTYPES.items() if dtype == "date"]
+
+
+# Function to normalize a column to stripped text (blank = ''), converting each distinct value once;
+# whole numbers lose any trailing '.0' so a value reads the same from XLSX, CSV or Parquet
+def _normalized_text(values):
+    def normalize(uniques):
+        uniques = pd.Series(uniques, dtype=object).map(lambda value: value.strip() if isinstance(value, str) else value)
+        blank = uniques.isna() | uniques.astype(str).eq('')
+        return text_values(uniques, blank).fillna('').to_numpy(dtype=object)
+
+    return map_uniques(values, normalize, fill='')
+
+
+# Function to fingerprint each row of a frame for a service type. unique_ids and dates (column ->
+# parsed dates) are passed in because scrubbing has already computed them.
+def row_fingerprints(frame, unique_ids, dates, service_type):
+    columns = {}
+    for col in get_schema(service_type).keep_columns:
+        if col == UNIQUE_ID:
+            columns[col] = canonical_unique_ids(unique_ids).fillna('').to_numpy(dtype=object)
+        elif col in dates:
+            columns[col] = dates[col].to_numpy(dtype='datetime64[ns]')
+        elif col in frame.columns:
+            columns[col] = _normalized_text(frame[col])
+        else:
+            columns[col] = np.full(len(frame), '', dtype=object)
+    normalized = pd.DataFrame(columns)
+
+    return pd.DataFrame({
+        "Key": pd.util.hash_pandas_object(normalized[KEY_COLUMNS], index=False).to_numpy().view('int64'),
+        "Fingerprint": pd.util.hash_pandas_object(normalized, index=False).to_numpy().view('int64'),
+    }, index=frame.index)
+
+
+# Function to fingerprint a previous KEEP file's rows
+def keep_fingerprints(keep_df):
+    dates = {col: parse_dates(keep_df[col])[0] for col in DATE_COLUMNS if col in keep_df.columns}
+    return row_fingerprints(keep_df, keep_df[UNIQUE_ID], dates, detect_service_type(keep_df))
+
+
+# Function to read a previous KEEP file (XLSX, CSV or Parquet) and fingerprint its rows
+def _keep_file_fingerprints(name, file):
+    if name.endswith(".parquet"):
+        keep_df = pd.read_parquet(file)
+    elif name.endswith(".csv"):
+        # read as text so ZIPs keep their leading zeros
+        keep_df = pd.read_csv(file, dtype=str)
+    else:
+        keep_df = read_xlsx_streaming(file)
+
+    if UNIQUE_ID not in keep_df.columns:
+        raise ValueError(f"{os.path.basename(name)} has no '{UNIQUE_ID}' column, so it isn't a KEEP file.")
+    return keep_fingerprints(keep_df)
+
+
+# Function to load the fingerprints of a previous submission from its downloaded ZIP, its
+# fingerprint CSV, or its KEEP file (file object with a .name)
+def load_fingerprints(previous_file):
+    name = os.path.basename(previous_file.name)
+    previous_file.seek(0)
+    if name.endswith(FINGERPRINT_SUFFIX):
+        return pd.read_csv(previous_file, usecols=FINGERPRINT_COLUMNS, dtype='int64')
+    if not name.endswith(".zip"):
+        return _keep_file_fingerprints(name, previous_file)
+
+    with zipfile.ZipFile(previous_file) as archive:
+        entries = archive.namelist()
+        fingerprint_entries = [entry for entry in entries if entry.endswith(FINGERPRINT_SUFFIX)]
+        if fingerprint_entries:
+            return pd.concat([pd.read_csv(io.BytesIO(archive.read(entry)), usecols=FINGERPRINT_COLUMNS, dtype='int64')
+                              for entry in fingerprint_entries], ignore_index=True)
+
+        # one KEEP file per upload (the same file may be there in several formats)
+        keep_entries = {}
+        for entry in entries:
+            if KEEP_ENTRY.search(entry):
+                keep_entries.setdefault(os.path.splitext(entry)[0], entry)
+        if not keep_entries:
+            raise ValueError(f"{name} has no KEEP or fingerprint file.")
+        return pd.concat([_keep_file_fingerprints(entry, io.BytesIO(archive.read(entry)))
+                          for entry in keep_entries.values()], ignore_index=True)
+
+
+# Rows of an upload that are new or changed since a previous submission; after scrubbing it also
+# holds the fingerprint set to store for the next submission
+class Delta:
+    def __init__(self, previous):
+        self.previous = previous
+        self.fingerprints = None
+        self.new = self.changed = self.unchanged = 0
+
+    # Function to pick the rows to scrub: those whose fingerprint isn't in the previous set
+    def select(self, frame, unique_ids, dates, service_type):
+        current = row_fingerprints(frame, unique_ids, dates, service_type)
+        unchanged = np.isin(current["Fingerprint"].to_numpy(), self.previous["Fingerprint"].to_numpy())
+        known = np.isin(current["Key"].to_numpy(), self.previous["Key"].to_numpy())
+
+        self.new = int((~known).sum())
+        self.changed = int((known & ~unchanged).sum())
+        self.unchanged = int(unchanged.sum())
+        # the previous set carries forward, so uploads of only the new rows work as well as cumulative ones
+        self.fingerprints = pd.concat([self.previous, current], ignore_index=True).drop_duplicates(
+            ignore_index=True)
+        return ~unchanged
+
+    def summary(self):
+        return (f"Only new and changed rows were scrubbed: {self.new:,} new, {self.changed:,} changed, and "
+                f"{self.unchanged:,} unchanged since the previous submission.")
+
+
+# Function to name the fingerprint file written with a KEEP file (x_clean_KEEP.xlsx -> x_fingerprints.csv)
+def fingerprint_filename(keep_filename):
+    return f"{keep_filename.split('_clean_KEEP')[0]}{FINGERPRINT_SUFFIX}"
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("worth.diagnostics")
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+# Function to get the current resident set size in MB (None where /proc isn't available)
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return round(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Function to get the process's peak resident set size in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)
+
+
+# Records wall time, memory, and row/column counts for each stage of processing one upload
+class Diagnostics:
+    def __init__(self, **context):
+        self.context = context
+        self.stages = []
+        self.current_stage = None
+        self.rows_done = 0
+        self.rows_total = None
+
+    @contextmanager
+    def stage(self, name, **details):
+        record = {"stage": name, **details}
+        self.current_stage = name
+        self.rows_done = 0
+        self.rows_total = details.get("rows")
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            record["rss_mb"] = current_rss_mb()
+            record["peak_rss_mb"] = peak_rss_mb()
+            self.stages.append(record)
+            logger.info(json.dumps({"event": "stage", **self.context, **record}, default=str))
+
+    # Called by long-running stages (e.g. workbook writing) with the number of rows processed so far
+    def progress(self, rows_done):
+        self.rows_done = rows_done
+
+    @property
+    def total_seconds(self):
+        return round(sum(record["seconds"] for record in self.stages), 4)
+
+
+# Function to time a stage when diagnostics are being collected (no-op otherwise);
+# the yielded dict can be filled in with details such as row counts
+def track(diagnostics, name, **details):
+    if diagnostics is None:
+        return nullcontext(dict(details))
+    return diagnostics.stage(name, **details)
@@ -0,0 +1,134 @@
+import datetime
+import hashlib
+import itertools
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from utils.unique_id import canonical_unique_ids
+from utils.validation import EXAMPLE_ROWS
+
+# rows sent to SQLite per executemany call
+INSERT_BATCH = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+-- one row per (Unique ID, person) pair; the same ID with a second person is a collision
+CREATE TABLE IF NOT EXISTS participants (
+    unique_id TEXT NOT NULL,
+    person TEXT NOT NULL,
+    organization TEXT,
+    source TEXT,
+    first_seen TEXT NOT NULL,
+    PRIMARY KEY (unique_id, person)
+) WITHOUT ROWID;
+"""
+
+
+# On-disk index of every Unique ID scrubbed so far, with a fingerprint of the person it was
+# built from. The fingerprint is a keyed hash of the normalized name and date of birth, with a
+# random key kept in the index file, so the index holds no PII.
+class IdIndex:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=30)
+        # readers don't block the single writer (several sessions may scrub at once), and in WAL
+        # mode commits only need to sync at checkpoints
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('person_key', ?)",
+                                    (os.urandom(16),))
+        self.person_key = self.connection.execute("SELECT value FROM meta WHERE key = 'person_key'").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.connection.close()
+
+    # Function to fingerprint each row's person; each distinct name/DOB pair is hashed once
+    def person_keys(self, names, dates_of_birth):
+        normalized = (names.astype(str).str.replace(' ', '', regex=False).str.lower() + '|'
+                      + dates_of_birth.dt.strftime('%Y-%m-%d').fillna(''))
+        codes, uniques = pd.factorize(normalized)
+        hashed = np.array([hashlib.blake2b(value.encode(), key=self.person_key, digest_size=16).hexdigest()
+                           for value in uniques], dtype=object)
+        return pd.Series(hashed[codes], index=names.index)
+
+    # Function to find the (Unique ID, person) pairs whose ID is already indexed for someone
+    # outside this batch. People sharing an ID within the batch are flagged by the within-batch
+    # check instead, so re-scrubbing the same file doesn't report them against each other.
+    def _historical_collisions(self, pairs):
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS batch (unique_id TEXT, person TEXT, "
+                                    "PRIMARY KEY (unique_id, person)) WITHOUT ROWID")
+            self.connection.execute("DELETE FROM batch")
+            self._insert("INSERT INTO batch (unique_id, person) VALUES (?, ?)",
+                         zip(pairs["unique_id"], pairs["person"]))
+            # each lookup is a range scan of the participants primary key that stops at the first
+            # match, and each exclusion a lookup in the batch's primary key
+            found = self.connection.execute(
+                "SELECT unique_id, person FROM batch WHERE EXISTS ("
+                "SELECT 1 FROM participants WHERE participants.unique_id = batch.unique_id "
+                "AND participants.person NOT IN ("
+                "SELECT person FROM batch AS current WHERE current.unique_id = batch.unique_id))").fetchall()
+        return pd.MultiIndex.from_tuples(found, names=["unique_id", "person"]) if found else None
+
+    # Function to insert rows a batch at a time
+    def _insert(self, sql, rows):
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, INSERT_BATCH)):
+            self.connection.executemany(sql, batch)
+
+    # Function to flag rows whose Unique ID belongs to a different person elsewhere in the batch
+    # or in an earlier submission, then add the batch to the index; rows without an ID are
+    # skipped. Returns two boolean arrays (within the batch, historical), one value per row.
+    def check_and_record(self, unique_ids, names, dates_of_birth, organizations, source):
+        has_id = unique_ids.notna().to_numpy()
+        rows = pd.DataFrame({
+            "unique_id": canonical_unique_ids(unique_ids[has_id]),
+            "person": self.person_keys(names[has_id], dates_of_birth[has_id]),
+            "organization": organizations[has_id].astype(object).where(organizations[has_id].notna(), None).to_numpy(),
+        })
+
+        within = np.zeros(len(unique_ids), dtype=bool)
+        historical = np.zeros(len(unique_ids), dtype=bool)
+        if rows.empty:
+            return within, historical
+
+        within[has_id] = (rows.groupby("unique_id")["person"].transform("nunique") > 1).to_numpy()
+
+        # inserted in primary key order, so the B-tree is appended to rather than split at random
+        pairs = rows.drop_duplicates(["unique_id", "person"]).sort_values(["unique_id", "person"])
+        found = self._historical_collisions(pairs)
+        if found is not None:
+            historical[has_id] = pd.MultiIndex.from_frame(rows[["unique_id", "person"]]).isin(found)
+
+        first_seen = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        with self.connection:
+            self._insert(
+                "INSERT OR IGNORE INTO participants (unique_id, person, organization, source, first_seen) "
+                "VALUES (?, ?, ?, ?, ?)",
+                zip(pairs["unique_id"], pairs["person"], pairs["organization"],
+                    itertools.repeat(source), itertools.repeat(first_seen)))
+
+        return within, historical
+
+
+# Function to describe flagged rows as warnings, listing the first few spreadsheet row numbers
+# (index holds each row's position in the upload)
+def collision_warnings(within, historical, index):
+    warnings = []
+    for flags, where in ((within, "elsewhere in this file"), (historical, "in an earlier submission")):
+        rows = np.asarray(index)[flags] + 2  # 1-based, after the header row
+        if len(rows):
+            examples = ", ".join(str(row) for row in rows[:EXAMPLE_ROWS]) + (", ..." if len(rows) > EXAMPLE_ROWS else "")
+            warnings.append(f"Warning: {len(rows):,} row(s) have a Unique ID already used by a different "
+                            f"participant {where}: row(s) {examples}")
+    return warnings
@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from utils.diagnostics import Diagnostics
+
+# scrub jobs running at once across all sessions; further uploads queue for a free worker. Fixed
+# rather than sized from the CPU count: jobs spend much of their time in I/O and in C code that
+# releases the GIL, and a one-CPU container would otherwise run a single job at a time, queueing
+# every partner's upload behind everyone else's
+MAX_WORKERS = 4
+
+# pipeline stages in the order a job runs them, used to turn the current stage into a progress fraction
+PIPELINE_STAGES = ["peek_validate", "read", "validate", "parse_dates", "unique_id", "delta", "project", "id_index",
+                   "write_keep", "write_send"]
+
+
+# Raised inside a job's worker thread once the job has been cancelled. Like
+# asyncio.CancelledError it is a BaseException, so the pipeline's
+# `except Exception` error handling doesn't swallow it.
+class JobCancelled(BaseException):
+    pass
+
+
+# Function to create the worker pool shared by every session
+def create_executor(max_workers=MAX_WORKERS):
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrub")
+
+
+# A scrub running on the worker pool; doubles as its Diagnostics so stages report progress
+class Job(Diagnostics):
+    def __init__(self, key, **context):
+        super().__init__(**context)
+        self.key = key
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def submit(self, executor, fn, *args):
+        self.future = executor.submit(fn, *args, self)
+        return self
+
+    # stages and row progress are the points where a cancelled job stops
+    def stage(self, name, **details):
+        self.check_cancelled()
+        return super().stage(name, **details)
+
+    def progress(self, rows_done):
+        self.check_cancelled()
+        super().progress(rows_done)
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    # Return the job's result, re-raising whatever the worker raised
+    def result(self):
+        try:
+            return self.future.result()
+        except CancelledError as e:
+            raise JobCancelled() from e
+
+    @property
+    def fraction(self):
+        if self.current_stage not in PIPELINE_STAGES:
+            return 0.0
+        completed = PIPELINE_STAGES.index(self.current_stage)
+        if self.rows_total:
+            completed += min(self.rows_done / self.rows_total, 1.0)
+        return completed / len(PIPELINE_STAGES)
+
+    @property
+    def status_text(self):
+        if self.current_stage is None:
+            return "Waiting for a free worker..."
+        label = self.current_stage.replace("_", " ").capitalize()
+        if self.rows_total and self.rows_done:
+            return f"{label}: {self.rows_done:,} of {self.rows_total:,} rows"
+        if self.rows_done:
+            return f"{label}: {self.rows_done:,} rows"
+        return f"{label}..."
+
+
+# Several jobs (one per uploaded file) tracked, and cancelled, together
+class JobGroup:
+    def __init__(self, key, jobs):
+        self.key = key
+        self.jobs = jobs
+
+    def cancel(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def done(self):
+        return all(job.done() for job in self.jobs)
+
+    # every file's stage timings, labelled with the file
+    @property
+    def stages(self):
+        return [{"file": job.context.get("file"), **record} for job in self.jobs for record in job.stages]
+
+    @property
+    def fraction(self):
+        return sum(1.0 if job.done() else job.fraction for job in self.jobs) / len(self.jobs)
+
+    @property
+    def status_text(self):
+        finished = sum(job.done() for job in self.jobs)
+        running = [job for job in self.jobs if not job.done() and job.current_stage is not None]
+        text = f"{finished} of {len(self.jobs)} files scrubbed"
+        if running:
+            text += f" · {running[0].context.get('file')}: {running[0].status_text}"
+        return text
@@ -0,0 +1,232 @@
+import importlib.util
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from pandas.api.extensions import take
+
+from utils.schema import CATEGORY_COLUMNS, COLUMN_DTYPES
+
+# uploads larger than this are read row-by-row instead of through pd.read_excel
+STREAMING_THRESHOLD_BYTES = 5 * 1024 * 1024
+
+# how often (in rows) the streaming reader and write_xlsx report progress
+PROGRESS_EVERY = 5000
+
+# data rows read when peeking at an upload to detect its service type and validate its schema
+PEEK_ROWS = 50
+
+# use the Rust-based calamine reader when it is installed
+HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+
+# strings pandas treats as missing by default (see pandas' read_csv `na_values`)
+NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+# Excel error values, which pd.read_excel also reads as missing
+EXCEL_ERRORS = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A', '#GETTING_DATA'}
+
+# text cells pandas converts to booleans
+BOOL_VALUES = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+
+# columns Excel often stores as numbers (ZIPs included), kept in the smallest type that holds them exactly
+NUMERIC_COLUMNS = frozenset(col for col, dtype in COLUMN_DTYPES.items() if dtype in ("number", "integer", "text"))
+
+# float32 holds every whole number up to this exactly
+FLOAT32_EXACT = 2**24
+
+
+# Function to get the size of an uploaded file (or any seekable file object)
+def file_size(file):
+    size = getattr(file, 'size', None)
+    if size is None:
+        position = file.tell()
+        file.seek(0, 2)
+        size = file.tell()
+        file.seek(position)
+    return size
+
+
+# Yield the first sheet of a workbook one row of plain values at a time
+def _iter_xlsx_rows(file, calamine=HAS_CALAMINE):
+    file.seek(0)
+    if calamine:
+        from python_calamine import CalamineWorkbook
+        workbook = CalamineWorkbook.from_filelike(file)
+        yield from workbook.get_sheet_by_index(0).iter_rows()
+    else:
+        workbook = load_workbook(file, read_only=True, data_only=True, keep_links=False)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+
+# Normalize one cell the way pandas' Excel readers do
+def _convert_cell(value):
+    if value is None or (isinstance(value, str) and (value in NA_VALUES or value in EXCEL_ERRORS)):
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# Turn a column of raw values into the dtype pd.read_excel would infer
+def _infer_column(values):
+    column = pd.Series(np.array(values, dtype=object), dtype=object)
+    if column.empty:
+        return column
+    if column.map(type).eq(bool).all():
+        return column.astype(bool)
+    try:
+        return pd.to_numeric(column)
+    except (ValueError, TypeError):
+        pass
+
+    # columns of TRUE/FALSE text become booleans (object dtype if any are missing)
+    non_null = column.dropna()
+    if len(non_null) and non_null.isin(list(BOOL_VALUES)).all():
+        column = column.map(BOOL_VALUES, na_action='ignore')
+        return column.astype(bool) if len(non_null) == len(column) else column
+
+    return column.infer_objects()
+
+
+# Function to read the first sheet of an XLSX file column-by-column without building the full workbook
+def read_xlsx_streaming(file, nrows=None, progress=None):
+    # calamine loads the whole sheet before yielding its first row, so reading only the first
+    # rows goes through openpyxl's read-only mode
+    rows = _iter_xlsx_rows(file, calamine=HAS_CALAMINE and nrows is None)
+    header = list(next(rows, []))
+    columns = [[] for _ in header]
+    n_rows = 0
+    pending_blank_rows = 0
+
+    for row in rows:
+        if nrows is not None and n_rows >= nrows:
+            break
+        values = [_convert_cell(value) for value in row]
+        if all(value is np.nan for value in values):
+            # blank rows are kept unless they trail the data, so hold them until more data arrives
+            pending_blank_rows += 1
+            continue
+
+        # rows wider than the header get extra (unnamed) columns, back-filled with missing values
+        while len(columns) < len(values):
+            header.append(None)
+            columns.append([np.nan] * n_rows)
+
+        for _ in range(pending_blank_rows):
+            for column in columns:
+                column.append(np.nan)
+        n_rows += pending_blank_rows
+        pending_blank_rows = 0
+
+        for col_num, column in enumerate(columns):
+            column.append(values[col_num] if col_num < len(values) else np.nan)
+        n_rows += 1
+        if progress is not None and n_rows % PROGRESS_EVERY == 0:
+            progress(n_rows)
+
+    # stop reading the workbook (matters when only peeking at the first rows)
+    rows.close()
+
+    # drop trailing columns that have neither a header nor any data
+    while header and _convert_cell(header[-1]) is np.nan and all(value is np.nan for value in columns[-1]):
+        header.pop()
+        columns.pop()
+
+    data = {}
+    seen = {}
+    for col_num, (name, values) in enumerate(zip(header, columns)):
+        name = f"Unnamed: {col_num}" if _convert_cell(name) is np.nan else _convert_cell(name)
+
+        # de-duplicate repeated headers the same way pandas does ("A", "A.1", ...)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        if count:
+            name = f"{name}.{count}"
+
+        data[name] = _infer_column(values)
+        values.clear()
+
+    return pd.DataFrame(data)
+
+
+# Store a numeric column in the smallest type that holds every value exactly: integers are
+# downcast, and whole-number floats (integers with blanks) become float32
+def _compact_numbers(values):
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return pd.to_numeric(values, downcast='integer')
+    if values.dtype == 'float64':
+        numbers = values.dropna()
+        if (numbers % 1 == 0).all() and (numbers.abs() < FLOAT32_EXACT).all():
+            return values.astype('float32')
+    return values
+
+
+# Function to shrink an upload's low-cardinality text columns to categoricals and its number
+# columns to compact types. Only all-text columns become categoricals, so values that compare
+# equal (1 and True, or 1 and 1.0) are never merged; every cell reads back unchanged.
+def compact_columns(df):
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col in CATEGORY_COLUMNS and values.dtype == object and pd.api.types.infer_dtype(values) == "string":
+            values = values.astype('category')
+        elif col in NUMERIC_COLUMNS:
+            values = _compact_numbers(values)
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+# Function to run convert once per distinct value of a column and map its results back to every
+# row. convert gets the distinct values and returns an array, or a tuple of arrays, with one entry
+# per distinct value; missing values get fill (one fill per array for a tuple, None for an
+# extension array's own missing value).
+def map_uniques(values, convert, fill=None):
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    results = convert(uniques)
+    if isinstance(results, tuple):
+        return tuple(_take(result, codes, result_fill) for result, result_fill in zip(results, fill))
+    return _take(results, codes, fill)
+
+
+# Pick an array's entry for each code; missing values have code -1, which gets fill instead
+def _take(result, codes, fill):
+    if isinstance(result, np.ndarray):
+        return take(result, codes, allow_fill=True, fill_value=fill)
+    return result.take(codes, allow_fill=True, fill_value=fill)
+
+
+# Function to read an uploaded CSV/XLSX file, streaming large workbooks, into compact column types
+def read_upload(uploaded_file, streaming_threshold=STREAMING_THRESHOLD_BYTES, progress=None):
+    uploaded_file.seek(0)
+    if uploaded_file.name.endswith(".csv"):
+        df = pd.read_csv(uploaded_file)
+    elif file_size(uploaded_file) > streaming_threshold:
+        df = read_xlsx_streaming(uploaded_file, progress=progress)
+    else:
+        df = pd.read_excel(uploaded_file)
+    return compact_columns(df)
+
+
+# Function to read only the header and first few data rows of an uploaded CSV/XLSX file
+def peek_upload(uploaded_file, nrows=PEEK_ROWS):
+    uploaded_file.seek(0)
+    try:
+        if uploaded_file.name.endswith(".csv"):
+            return pd.read_csv(uploaded_file, nrows=nrows)
+        return read_xlsx_streaming(uploaded_file, nrows=nrows)
+    finally:
+        uploaded_file.seek(0)
+
+
+# Function to detect the service type from the first non-null 'Service' value
+def detect_service_type(df):
+    if "Service" in df.columns and len(df) > 0:
+        services = df["Service"].dropna()
+        return services.iloc[0] if not services.empty else None
+    return None
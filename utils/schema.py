@@ -0,0 +1,123 @@
+from collections import namedtuple
+
+SERVICE_CATEGORIES = [
+    "New Units Produced",
+    "Housing Counseling",
+    "Down Payment Assistance",
+    "Home Rehabilitation",
+    "Legacy Resident Tax Relief",
+    "Heirs Property Resolution",
+    "Education",
+    "CDFI Activity",
+]
+
+COUNSELING_SERVICE_OPTIONS = [
+    'Home Purchase',
+    'Foreclosure Prevention',
+    'Mortgage Default',
+    'Rental Counseling',
+    'Other',
+]
+
+HAS_SOLD_OPTIONS = ['TRUE', 'FALSE']
+
+# answers accepted in the (Y/N) columns
+YES_NO_OPTIONS = ['Y', 'N', 'Yes', 'No']
+
+# column added by scrubbing; it goes just before the first PII column in the outputs
+UNIQUE_ID = "Unique ID"
+
+# output file formats, in the order they're offered; XLSX is the default
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+DEFAULT_FORMATS = ("xlsx",)
+
+# One template column:
+#   width     - column width in the downloaded template
+#   only      - services whose template has the column (None = every template)
+#   excluded  - services whose template leaves it out
+#   pii       - stripped from the SEND file
+#   required  - an upload missing the column is rejected
+#   options   - allowed values, checked on upload
+#   dropdown  - options are also embedded in the template as a dropdown list
+#   dtype     - type written to columnar (CSV/Parquet) outputs: "date", "number", "integer" or "text"
+#   category  - holds a handful of distinct values, so uploads keep it in memory as a categorical
+Column = namedtuple("Column", ["name", "width", "only", "excluded", "pii", "required", "options", "dropdown", "dtype",
+                               "category"],
+                    defaults=[None, frozenset(), False, True, None, False, None, False])
+
+# Every template column, in header order
+COLUMNS = [
+    Column("Service", 20, category=True),
+    Column("Submitting Organization", 25, category=True),
+    Column("Service Completion Date", 20, dtype="date"),
+    Column("Counseling Service Rendered", 25, only={"Housing Counseling"},
+           options=COUNSELING_SERVICE_OPTIONS, dropdown=True, category=True),
+    Column("Name", 20, pii=True),
+    Column("Date of Birth", 15, pii=True, dtype="date"),
+    Column("Street Address", 35, pii=True),
+    Column("Unit (if applicable)", 20, pii=True),
+    Column("County", 15, category=True),
+    Column("ZIP", 8, dtype="text"),
+    Column("Race", 10, required=False, category=True),
+    Column("Ethnicity", 10, required=False, category=True),
+    Column("Primary Language", 15, required=False, category=True),
+    Column("Gender", 10, required=False, category=True),
+    Column("HH Income", 15, dtype="number"),
+    Column("HH Size", 15, dtype="integer"),
+    Column("1st Time Home Buyer (Y/N)", 22, only={"Education"}, options=YES_NO_OPTIONS, category=True),
+    Column("Existing Homeowner (Y/N)", 22, excluded={"Education"}, options=YES_NO_OPTIONS, category=True),
+    Column("First-Generation Homeowner (Y/N)", 28, excluded={"Education"}, options=YES_NO_OPTIONS, category=True),
+    Column("Has Sold?", 12, only={"New Units Produced"}, options=HAS_SOLD_OPTIONS, dropdown=True, category=True),
+]
+
+# column -> output type, shared by every service type
+COLUMN_DTYPES = {column.name: column.dtype for column in COLUMNS if column.dtype}
+
+# columns with few distinct values, shared by every service type
+CATEGORY_COLUMNS = frozenset(column.name for column in COLUMNS if column.category)
+
+
+# Everything derived from the column list for one service type, computed once at import
+class TemplateSchema:
+    def __init__(self, service):
+        self.service = service
+        columns = [column for column in COLUMNS
+                   if (column.only is None or service in column.only) and service not in column.excluded]
+
+        # template layout
+        self.columns = tuple(column.name for column in columns)
+        self.widths = {column.name: column.width for column in columns}
+        self.dropdowns = {column.name: column.options for column in columns if column.dropdown}
+
+        # upload checks
+        self.required_columns = tuple(column.name for column in columns if column.required)
+        self.options = {column.name: column.options for column in columns if column.options}
+        self.allowed_values = {name: frozenset(str(option).casefold() for option in options)
+                               for name, options in self.options.items()}
+
+        # KEEP/SEND projections
+        self.pii = frozenset(column.name for column in columns if column.pii)
+        self.optional = frozenset(column.name for column in columns if not column.required)
+        first_pii = next(i for i, column in enumerate(columns) if column.pii)
+        self.keep_columns = self.columns[:first_pii] + (UNIQUE_ID,) + self.columns[first_pii:]
+        self.send_columns = tuple(name for name in self.keep_columns if name not in self.pii)
+        self.output_columns = frozenset(self.keep_columns)
+
+    # Function to order a scrubbed frame's columns for the KEEP and SEND files; optional
+    # columns that weren't uploaded are skipped and extra columns go at the end of both
+    def project(self, present_columns):
+        present = set(present_columns)
+        extra_columns = [col for col in present_columns if col not in self.output_columns]
+        keep_columns = [col for col in self.keep_columns if col in present or col not in self.optional]
+        send_columns = [col for col in self.send_columns if col in present or col not in self.optional]
+        return keep_columns + extra_columns, send_columns + extra_columns
+
+
+# One schema per service category; uploads whose service isn't recognized use the default layout
+SCHEMAS = {service: TemplateSchema(service) for service in SERVICE_CATEGORIES}
+DEFAULT_SCHEMA = TemplateSchema(None)
+
+
+# Function to look up the schema for a service type
+def get_schema(service_type):
+    return SCHEMAS.get(service_type, DEFAULT_SCHEMA)
@@ -0,0 +1,250 @@
+import io
+import os
+import sqlite3
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pytz import timezone
+
+from utils.dates import parse_dates
+from utils.delta import fingerprint_filename
+from utils.diagnostics import track
+from utils.id_index import IdIndex, collision_warnings
+from utils.readers import detect_service_type, file_size, peek_upload, read_upload
+from utils.schema import COLUMN_DTYPES, get_schema
+from utils.unique_id import build_unique_ids
+from utils.validation import issue_warnings, validate_rows
+from utils.writers import DEFAULT_FORMATS, output_filename, typed_columns, write_to_zip
+
+
+# Raised when an upload can't be read, doesn't match its template, or fails to scrub
+class UploadError(ValueError):
+    pass
+
+
+# Function to raise an UploadError if any expected columns are missing
+def check_columns(uploaded_columns, service_type):
+    uploaded_columns = set(uploaded_columns)
+    missing_columns = [
+        col for col in get_schema(service_type).required_columns if col not in uploaded_columns]
+
+    if missing_columns:
+        raise UploadError(
+            f"Uploaded file missing the following column(s): {', '.join(missing_columns)}. Please modify your source data and upload again!"
+        )
+
+
+# Function to peek at the header and first rows of an upload, detect its service type
+# and validate its columns, all before the full file is parsed
+def check_upload(uploaded_file, diagnostics=None):
+    with track(diagnostics, "peek_validate"):
+        try:
+            peek_df = peek_upload(uploaded_file)
+        except Exception as e:
+            raise UploadError(f"Could not read the uploaded file: {str(e)}") from e
+
+        service_type = detect_service_type(peek_df)
+        check_columns(list(peek_df.columns), service_type)
+
+    return service_type
+
+
+# Function to validate and parse an upload (file object with a .name) into a DataFrame
+def load_upload(uploaded_file, diagnostics=None):
+    service_type = check_upload(uploaded_file, diagnostics)
+
+    # Read uploaded file into DataFrame (large workbooks are streamed row-by-row)
+    with track(diagnostics, "read", file_mb=round(file_size(uploaded_file) / 2**20, 2)) as stage:
+        try:
+            df = read_upload(uploaded_file, progress=diagnostics.progress if diagnostics is not None else None)
+        except Exception as e:
+            # e.g. a ragged CSV row or a corrupt workbook past the rows peeked at
+            raise UploadError(f"Could not read the uploaded file: {str(e)}") from e
+        stage.update(rows=len(df), columns=len(df.columns))
+
+    # Fall back to the full 'Service' column if the first rows didn't name a service
+    if service_type is None:
+        service_type = detect_service_type(df)
+        check_columns(list(df.columns), service_type)
+
+    return service_type, df
+
+
+# Function to check each row's values against the template's rules; returns the
+# failing-cell report and one warning per column with problems
+def validate_upload(df, service_type, diagnostics=None):
+    with track(diagnostics, "validate", rows=len(df)) as stage:
+        issues = validate_rows(df, service_type)
+        stage["issues"] = len(issues)
+    return issues, issue_warnings(issues)
+
+
+# Function to scrub data; the caller's DataFrame is left unchanged, and the KEEP/SEND
+# frames share its untouched columns instead of copying them. With id_index (the path of a
+# SQLite file), Unique IDs shared by different participants are flagged and recorded. With a
+# delta (utils.delta.Delta), only rows new or changed since its previous submission are kept.
+def scrub_data(df, original_filename, service_type, diagnostics=None, id_index=None, delta=None):
+    # Initialize warnings list
+    warnings = []
+
+    # Columns this function rewrites or adds; everything else is passed through as-is
+    derived = {}
+    
+    # Validate date columns before processing
+    try:
+        with track(diagnostics, "parse_dates", rows=len(df)) as stage:
+            # Convert 'Date of Birth' to datetime with error handling - this is non-critical
+            date_of_birth, dob_failed = parse_dates(df['Date of Birth'])
+            # # Check if any dates couldn't be parsed
+            # if df['Date of Birth'].isna().any():
+            #     invalid_dob_rows = df[df['Date of Birth'].isna()].index.tolist()
+            #     warnings.append(f"Warning: Invalid date format found in 'Date of Birth' column. While not essential, this field is used to generate a unique ID for each record. This unique ID can still be generatged, but it will not be based on accurate, record-level information for that individual. Proceed with caution!")
+            
+            #     # For missing Date of Birth values, set a default date to allow processing to continue
+            #     df.loc[df['Date of Birth'].isna(), 'Date of Birth'] = pd.Timestamp('1900-01-01')
+
+            # Convert 'Service Completion Date' to datetime; blanks and 'N/A' are left empty
+            completion_date, scd_failed = parse_dates(df['Service Completion Date'])
+            # if df['Service Completion Date'].isna().any():
+            #     invalid_scd_rows = df[df['Service Completion Date'].isna()].index.tolist()
+            #     error_msg = f"Invalid date format found in 'Service Completion Date' column. Please check your data and upload again with this column filled in with proper date formatting."
+            #     return None, None, None, None, error_msg, warnings
+
+            stage["dob_failed"] = dob_failed
+            stage["completion_failed"] = scd_failed
+            for column, failed in (('Date of Birth', dob_failed), ('Service Completion Date', scd_failed)):
+                if failed:
+                    warnings.append(f"Warning: {failed:,} row(s) in the '{column}' column could not be read as dates and were left blank.")
+    
+        with track(diagnostics, "unique_id", rows=len(df)):
+            # Build the zero-padded Unique ID from Name + DOB
+            unique_ids = build_unique_ids(df['Name'], date_of_birth)
+
+        # Calculate number of non-null 'Name' values
+        valid_count = df['Name'].notna().sum()
+        valid_rows = np.arange(len(df)) < valid_count
+
+        if delta is not None:
+            with track(diagnostics, "delta", rows=len(df)) as stage:
+                # rows past the valid ones are dropped, and rows unchanged since the previous
+                # submission skip the rest of scrubbing
+                rows = valid_rows.copy()
+                rows[valid_rows] = delta.select(
+                    df[valid_rows], unique_ids[valid_rows],
+                    {'Date of Birth': date_of_birth[valid_rows], 'Service Completion Date': completion_date[valid_rows]},
+                    service_type)
+                df, unique_ids = df[rows], unique_ids[rows]
+                date_of_birth, completion_date = date_of_birth[rows], completion_date[rows]
+                valid_rows = np.ones(len(df), dtype=bool)
+                stage.update(new=delta.new, changed=delta.changed, unchanged=delta.unchanged)
+                warnings.append(delta.summary())
+    
+        with track(diagnostics, "project", rows=len(df)) as stage:
+            # Truncate the 'Service' and 'Unique ID' columns
+            derived['Service'] = df['Service'].where(valid_rows, None)
+            derived['Unique ID'] = unique_ids.where(valid_rows, None)
+    
+            # Properly format the dates
+            derived['Service Completion Date'] = completion_date.dt.strftime('%m/%d/%Y')
+            derived['Date of Birth'] = date_of_birth.dt.strftime('%m/%d/%Y')
+    
+            # Look up the KEEP/SEND column order (PII excluded from SEND) for this service type
+            keep_columns, send_columns = get_schema(service_type).project(df.columns)
+
+            # Create two versions of the DataFrame as column projections: both reference the
+            # derived columns and the caller's other columns without copying them
+            columns = {col: derived[col] if col in derived else df[col] for col in keep_columns}
+            keep_df = pd.DataFrame(columns, copy=False)
+            send_df = pd.DataFrame({col: columns[col] for col in send_columns}, copy=False)
+            stage["columns"] = len(keep_columns)
+
+        if id_index is not None:
+            with track(diagnostics, "id_index", rows=len(df)) as stage:
+                try:
+                    with IdIndex(id_index) as index:
+                        within, historical = index.check_and_record(
+                            derived['Unique ID'], df['Name'], date_of_birth, df['Submitting Organization'],
+                            os.path.basename(original_filename))
+                except sqlite3.Error as e:
+                    # the index is optional, so a locked or unreadable file doesn't block the upload
+                    warnings.append(f"Warning: Unique IDs could not be checked against earlier submissions ({str(e)}).")
+                else:
+                    stage.update(within_collisions=int(within.sum()), historical_collisions=int(historical.sum()))
+                    warnings.extend(collision_warnings(within, historical, df.index))
+    
+        # Name the output workbooks (they are written straight into the ZIP by the caller)
+        keep_filename = f"{original_filename.split('.')[0]}_clean_KEEP.xlsx"
+        send_filename = f"{original_filename.split('.')[0]}_clean_SEND.xlsx"
+    
+        return keep_df, keep_filename, send_df, send_filename, None, warnings
+    
+    except Exception as e:
+        return None, None, None, None, f"An error occurred during data processing: {str(e)}", warnings
+
+
+# Function to name the output ZIP after the upload and the current Eastern time
+def zip_file_name(original_filename):
+    tz = timezone("America/New_York")
+    timestamp = datetime.now(tz).strftime("%m-%d-%Y_%I.%M%p")
+    return f"{os.path.basename(original_filename).split('.')[0]}_cleaned_{timestamp}.zip"
+
+
+# Function to write the KEEP/SEND files into a ZIP (path or file object) in each requested
+# format (XLSX by default), streaming each file directly into its entry; in delta mode the
+# fingerprint set for the next submission is added too
+def package_zip(zip_target, keep_df, keep_filename, send_df, send_filename, diagnostics=None,
+                keep_formats=DEFAULT_FORMATS, send_formats=DEFAULT_FORMATS, fingerprints=None):
+    progress = diagnostics.progress if diagnostics is not None else None
+    outputs = [("write_keep", keep_df, keep_filename, keep_formats), ("write_send", send_df, send_filename, send_formats)]
+    with zipfile.ZipFile(zip_target, "w") as zip_file:
+        for stage_name, df, filename, formats in outputs:
+            with track(diagnostics, stage_name, rows=len(df), columns=len(df.columns), formats=",".join(formats)):
+                # CSV and Parquet get typed columns instead of the workbook's date text
+                typed_df = typed_columns(df, COLUMN_DTYPES) if set(formats) - {"xlsx"} else None
+                for file_format in formats:
+                    write_to_zip(zip_file, output_filename(filename, file_format),
+                                 df if file_format == "xlsx" else typed_df, file_format, progress)
+        if fingerprints is not None:
+            write_to_zip(zip_file, fingerprint_filename(keep_filename), fingerprints, "csv")
+
+
+# Function to summarize a multi-file upload, one row per file
+def build_manifest(filenames, results):
+    return pd.DataFrame({
+        "File": filenames,
+        "Service": [result["service"] for result in results],
+        "Rows": [result["rows"] for result in results],
+        "Rows Needing Attention": [result["issues"]["Row"].nunique() for result in results],
+        "Warnings": [len(result["warnings"]) for result in results],
+        "Seconds": [round(result["seconds"], 2) for result in results],
+    })
+
+
+# Function to name each upload after its file, numbering repeated names (report, report_2, ...)
+def unique_stems(filenames):
+    stems = []
+    for filename in filenames:
+        stem = os.path.basename(filename).split('.')[0]
+        name, n = stem, 1
+        while name in stems:
+            n += 1
+            name = f"{stem}_{n}"
+        stems.append(name)
+    return stems
+
+
+# Function to combine several uploads' KEEP/SEND ZIPs into one ZIP (path or file object)
+# with a folder per upload and a manifest.csv; returns the manifest
+def package_combined_zip(zip_target, filenames, results):
+    manifest = build_manifest(filenames, results)
+    with zipfile.ZipFile(zip_target, "w") as combined:
+        # one folder per upload, named after it
+        for folder, result in zip(unique_stems(filenames), results):
+            with zipfile.ZipFile(io.BytesIO(result["zip"])) as file_zip:
+                for info in file_zip.infolist():
+                    combined.writestr(f"{folder}/{info.filename}", file_zip.read(info))
+
+        combined.writestr("manifest.csv", manifest.to_csv(index=False))
+    return manifest
@@ -0,0 +1,63 @@
+import functools
+import io
+
+import xlsxwriter
+
+from utils.schema import SERVICE_CATEGORIES, get_schema
+
+# bump this whenever the template layout changes so cached bytes are rebuilt
+SCHEMA_VERSION = 2
+
+# number of rows pre-filled with the service name, and the most a user can ask for
+DEFAULT_ROWS = 50
+MAX_ROWS = 100_000
+
+# last worksheet row (0-based); dropdowns cover every row up to it
+LAST_ROW = 1_048_575
+
+# header cell style pandas' to_excel applies (bold, thin border, centered), used for templates and outputs
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+# Build the template workbook once per (service, rows, schema version) per process. Only the
+# header and the Service column are written, row by row in constant-memory mode, and each
+# dropdown is one whole-column range, so time and size barely grow with the row count.
+@functools.lru_cache(maxsize=64)
+def build_template(service_rendered, rows_in_spreadsheet=DEFAULT_ROWS, schema_version=SCHEMA_VERSION):
+    schema = get_schema(service_rendered)
+
+    buffer = io.BytesIO()
+    with xlsxwriter.Workbook(buffer, {"constant_memory": True}) as workbook:
+        worksheet = workbook.add_worksheet("Sheet1")
+
+        # Set column widths
+        for col_num, (col_name, width) in enumerate(schema.widths.items()):
+            worksheet.set_column(col_num, col_num, width)
+
+        # Add dropdown validation for list-validated columns, below the header to the last row
+        for col_name, options in schema.dropdowns.items():
+            col_num = schema.columns.index(col_name)
+            worksheet.data_validation(1, col_num, LAST_ROW, col_num, {
+                'validate': 'list',
+                'source': options
+            })
+
+        worksheet.write_row(0, 0, schema.columns, workbook.add_format(HEADER_FORMAT))
+
+        # auto-fill the first N rows
+        service_col = schema.columns.index("Service")
+        for row in range(1, rows_in_spreadsheet + 1):
+            worksheet.write_string(row, service_col, service_rendered)
+
+    return buffer.getvalue()
+
+
+# Serve cached template bytes for the current schema version
+def get_template(service_rendered, rows_in_spreadsheet=DEFAULT_ROWS):
+    return build_template(service_rendered, rows_in_spreadsheet, SCHEMA_VERSION)
+
+
+# Pre-build every service category's template so the first download is instant
+def warm_template_cache(rows_in_spreadsheet=DEFAULT_ROWS):
+    for service_rendered in SERVICE_CATEGORIES:
+        get_template(service_rendered, rows_in_spreadsheet)
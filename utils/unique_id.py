@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# fixed reference date the DOB day count is measured from
+REFERENCE_DATE = pd.Timestamp('1920-01-02')
+
+# length every ID is padded to when IDs from different files are compared
+ID_WIDTH = 9
+
+
+# Day-count part of the ID: every 2nd character of the day count as pandas would print it
+def _dob_part(dates_of_birth, reference_date):
+    days = (dates_of_birth - reference_date).dt.days
+    missing = days.isna().to_numpy()
+
+    # cast the whole-day counts to text in one pass
+    digits = pc.cast(pa.array(days.fillna(0).to_numpy(dtype='int64')), pa.string())
+
+    # a single missing DOB turns the day count into floats, printed as "29219.0" / "nan"
+    if missing.any():
+        digits = pc.binary_join_element_wise(digits, '.0', '')
+        digits = pc.if_else(pa.array(missing), 'nan', digits)
+
+    return pc.utf8_slice_codeunits(digits, 0, np.iinfo(np.int32).max, 2)
+
+
+# Name part of the ID: every 3rd character from index 1, cut/padded to 4 characters
+def _name_part(names):
+    name_text = pa.array(names.astype(str).to_numpy(dtype=object), type=pa.string())
+    name_text = pc.replace_substring(name_text, ' ', '')
+
+    # Arrow's case mapping differs from Python's for a handful of non-ASCII letters
+    # (e.g. 'İ'), so those rows go through str.lower() to keep IDs byte-identical
+    lowered = pc.utf8_lower(name_text)
+    non_ascii = pc.invert(pc.string_is_ascii(name_text))
+    if pc.any(non_ascii).as_py():
+        python_lowered = pa.array([None if value is None else value.lower()
+                                   for value in pc.filter(name_text, non_ascii).to_pylist()],
+                                  type=pa.string())
+        lowered = pc.replace_with_mask(lowered, non_ascii, python_lowered)
+
+    name_part = pc.utf8_slice_codeunits(lowered, 1, np.iinfo(np.int32).max, 3)
+    name_part = pc.utf8_slice_codeunits(name_part, 0, 4)
+    return pc.utf8_rpad(name_part, 4, 'x')
+
+
+# Build the Unique ID column from the Name and (already parsed) Date of Birth columns
+def build_unique_ids(names, dates_of_birth, reference_date=REFERENCE_DATE):
+    unique_ids = pc.binary_join_element_wise(
+        _name_part(names), _dob_part(dates_of_birth, reference_date), '-')
+
+    # Zero-pad all values to the same length as the max value
+    max_length = pc.max(pc.utf8_length(unique_ids)).as_py() or 0
+    unique_ids = pc.utf8_rpad(unique_ids, max_length, '0')
+
+    return pd.Series(unique_ids.to_numpy(zero_copy_only=False), index=names.index, dtype=object)
+
+
+# IDs are padded to the longest ID in their own file, and a missing DOB anywhere in a file
+# adds a '.' or '0' to every day count, so the same participant can be "abcd-135" in one
+# SEND file and "abcd-1350" or "abcd-13." in another. Dropping the '.' and padding to a
+# fixed width makes IDs from different files comparable.
+def canonical_unique_ids(unique_ids, width=ID_WIDTH):
+    ids = pa.array(unique_ids.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+    ids = pc.utf8_rpad(pc.replace_substring(ids, '.', ''), width, '0')
+    return pd.Series(ids.to_numpy(zero_copy_only=False), index=unique_ids.index, dtype=object)
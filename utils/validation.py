@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from utils.readers import map_uniques
+from utils.schema import DEFAULT_SCHEMA, SCHEMAS, get_schema
+
+# 5-digit ZIP or ZIP+4; a trailing '.0' is allowed because Excel stores ZIPs as numbers
+ZIP_PATTERN = r'\d{5}(?:-?\d{4})?(?:\.0)?'
+
+# currency symbols and thousands separators stripped before checking numbers
+NUMBER_PUNCTUATION = r'[$,\s]'
+
+# number of example rows listed in each warning
+EXAMPLE_ROWS = 5
+
+# columns of the report returned by validate_rows
+ISSUE_COLUMNS = ["Row", "Column", "Value", "Problem"]
+
+
+# Mask of cells left blank (blank cells are never flagged; required columns are checked by name)
+def _blank(values):
+    return values.isna() | values.astype(str).str.strip().eq('')
+
+
+# Function to flag values that aren't in a column's set of allowed (casefolded) options
+def _not_in(allowed):
+    def check(values):
+        return ~values.astype(str).str.strip().str.casefold().isin(allowed)
+    return check
+
+
+# Function to convert a column to numbers, ignoring '$' and ',' (NaN where it isn't a number)
+def to_number(values):
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return values.astype('float64')
+    text = values.astype(str).str.replace(NUMBER_PUNCTUATION, '', regex=True)
+    numbers = pd.to_numeric(text, errors='coerce')
+    # booleans would otherwise pass as 1/0
+    return numbers.mask(values.map(type).eq(bool))
+
+
+def _not_zip(values):
+    return ~values.astype(str).str.strip().str.fullmatch(ZIP_PATTERN)
+
+
+def _not_income(values):
+    numbers = to_number(values)
+    return ~(numbers >= 0)
+
+
+def _not_household_size(values):
+    numbers = to_number(values)
+    return ~((numbers >= 1) & (numbers % 1 == 0))
+
+
+# Function to build the (column, check, problem) rules for a service type's template
+def _schema_rules(schema):
+    rules = [
+        ("ZIP", _not_zip, "Not a 5-digit ZIP code"),
+        ("HH Income", _not_income, "Not a number of dollars"),
+        ("HH Size", _not_household_size, "Not a whole number of people"),
+    ]
+    rules.extend((col, _not_in(allowed), f"Not one of: {', '.join(schema.options[col])}")
+                 for col, allowed in schema.allowed_values.items())
+    return tuple(rule for rule in rules if rule[0] in schema.widths)
+
+
+# Rules for every schema, built once at import
+RULES = {schema.service: _schema_rules(schema) for schema in [*SCHEMAS.values(), DEFAULT_SCHEMA]}
+
+
+# Function to look up the rules for a service type
+def template_rules(service_type):
+    return RULES[get_schema(service_type).service]
+
+
+# Flag the distinct values of a column that are non-blank and fail check
+def _bad_values(uniques, check):
+    uniques = pd.Series(uniques, dtype=None if len(uniques) else object)
+    return (check(uniques) & ~_blank(uniques)).to_numpy(dtype=bool)
+
+
+# Function to check every row of an upload against its template's rules, one column at a time;
+# returns one row per failing cell with its spreadsheet row number
+def validate_rows(df, service_type):
+    issues = []
+    for col, check, problem in template_rules(service_type):
+        if col not in df.columns:
+            continue
+        values = df[col]
+        failing = np.flatnonzero(map_uniques(values, lambda uniques: _bad_values(uniques, check), fill=False))
+        if len(failing):
+            issues.append(pd.DataFrame({
+                "Row": failing + 2,  # 1-based, after the header row
+                "Column": col,
+                "Value": values.iloc[failing].astype(str).to_numpy(),
+                "Problem": problem,
+            }))
+
+    if not issues:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(issues, ignore_index=True).sort_values("Row", kind="stable", ignore_index=True)
+
+
+# Function to summarize a validation report as one warning per column
+def issue_warnings(issues):
+    warnings = []
+    for col, col_issues in issues.groupby("Column", sort=False):
+        rows = col_issues["Row"].tolist()
+        examples = ", ".join(str(row) for row in rows[:EXAMPLE_ROWS]) + (", ..." if len(rows) > EXAMPLE_ROWS else "")
+        warnings.append(f"Warning: {len(rows):,} row(s) have an invalid '{col}' value "
+                        f"({col_issues['Problem'].iloc[0]}): row(s) {examples}")
+    return warnings
@@ -0,0 +1,39 @@
+import importlib
+import importlib.util
+import json
+import threading
+import time
+
+from utils.diagnostics import logger
+
+# modules the upload and template pages need, imported ahead of time in the order they're used
+WARM_MODULES = ["pandas", "pyarrow", "pyarrow.compute", "pyarrow.parquet", "openpyxl", "xlsxwriter", "pytz",
+                "utils.scrub", "utils.templates", "utils.consolidate"]
+if importlib.util.find_spec("python_calamine") is not None:
+    WARM_MODULES.append("python_calamine")
+
+_lock = threading.Lock()
+_thread = None
+
+
+# Function to import the heavy modules and build every template, logging how long it took
+def warm_up():
+    start = time.perf_counter()
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    imported = time.perf_counter()
+
+    importlib.import_module("utils.templates").warm_template_cache()
+    logger.info(json.dumps({"event": "warmup", "import_seconds": round(imported - start, 4),
+                            "template_seconds": round(time.perf_counter() - imported, 4)}))
+
+
+# Function to start the warm-up on a background thread, once per process; pages render without
+# waiting for it, and a page that needs a module first simply finishes importing it
+def start_warmup():
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+            _thread.start()
+    return _thread
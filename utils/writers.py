@@ -0,0 +1,221 @@
+import datetime
+import io
+import os
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+from xlsxwriter.utility import xl_pixel_width
+
+from utils.dates import parse_dates
+from utils.readers import PROGRESS_EVERY
+from utils.schema import DEFAULT_FORMATS, OUTPUT_FORMATS
+from utils.templates import HEADER_FORMAT
+
+# number formats pandas' ExcelWriter uses for dates and datetimes
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+DATE_FORMAT = 'YYYY-MM-DD'
+
+# Excel's widest column, in characters
+MAX_COLUMN_WIDTH = 255.0
+
+# rows per XLSX/CSV chunk and Parquet row group (CSV and Parquet chunks each report progress)
+CHUNK_ROWS = 50_000
+
+
+# Convert a cell to the plain Python value pandas' to_excel would write (None = leave blank)
+def _cell_value(value):
+    if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.timedelta)):
+        return value
+    return str(value)
+
+
+# Pixel width of one written value, using the same rules as xlsxwriter's autofit()
+def _pixel_width(value, default_date_pixels):
+    if isinstance(value, bool):
+        return 31 if value else 36
+    if isinstance(value, (int, float)):
+        return 7 * len(str(value))
+    if isinstance(value, (datetime.date, datetime.timedelta)):
+        return default_date_pixels
+    return max(xl_pixel_width(line) for line in value.split("\n"))
+
+
+# Convert an autofit pixel width to a column width, like xlsxwriter's autofit()
+def _pixels_to_width(pixels):
+    pixels += 7
+    width = pixels / 12.0 if pixels <= 12 else (pixels - 5.0) / 7.0
+    return min(width, MAX_COLUMN_WIDTH)
+
+
+# Function to write a DataFrame to an XLSX file object one row at a time
+def write_xlsx(file, df, sheet_name='Data', progress=None):
+    # constant_memory flushes each row to a temp file as soon as the next one starts,
+    # so the workbook never holds more than a row of cells in memory
+    workbook = xlsxwriter.Workbook(file, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(sheet_name)
+    header_format = workbook.add_format(HEADER_FORMAT)
+    datetime_format = workbook.add_format({'num_format': DATETIME_FORMAT})
+    date_format = workbook.add_format({'num_format': DATE_FORMAT})
+    default_date_pixels = worksheet.default_date_pixels
+
+    # autofit() needs every cell in memory, so size columns from each column's distinct values instead
+    column_pixels = []
+    for col_num, col_name in enumerate(df.columns):
+        worksheet.write(0, col_num, str(col_name), header_format)
+        pixels = _pixel_width(str(col_name), default_date_pixels)
+        for value in pd.unique(df.iloc[:, col_num]):
+            value = _cell_value(value)
+            if value is not None:
+                pixels = max(pixels, _pixel_width(value, default_date_pixels))
+        column_pixels.append(pixels)
+
+    # cells are converted to Python objects a chunk of rows at a time, so memory stays bounded
+    # however long the frame is
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        columns = [chunk.iloc[:, col_num].tolist() for col_num in range(len(chunk.columns))]
+        for row_num, row in enumerate(zip(*columns), start=start + 1):
+            for col_num, value in enumerate(row):
+                value = _cell_value(value)
+                if value is None:
+                    continue
+                if isinstance(value, datetime.datetime):
+                    worksheet.write_datetime(row_num, col_num, value, datetime_format)
+                elif isinstance(value, datetime.date):
+                    worksheet.write_datetime(row_num, col_num, value, date_format)
+                elif isinstance(value, datetime.timedelta):
+                    worksheet.write_number(row_num, col_num, value.total_seconds() / 86400)
+                else:
+                    worksheet.write(row_num, col_num, value)
+            if progress is not None and row_num % PROGRESS_EVERY == 0:
+                progress(row_num)
+
+    for col_num, pixels in enumerate(column_pixels):
+        worksheet.set_column(col_num, col_num, _pixels_to_width(pixels))
+
+    workbook.close()
+
+
+# Function to write a DataFrame as an XLSX entry streamed directly into an open ZipFile
+def write_xlsx_to_zip(zip_file, filename, df, sheet_name='Data', progress=None):
+    with zip_file.open(filename, 'w', force_zip64=True) as entry:
+        write_xlsx(entry, df, sheet_name, progress)
+
+
+# Function to convert a column to strings (blank cells become missing); whole numbers, e.g.
+# ZIPs Excel stored as numbers, are written without a trailing '.0'
+def text_values(values, blank):
+    numbers = pd.to_numeric(values, errors='coerce')
+    whole = numbers.notna() & (numbers % 1 == 0)
+    text = values.astype(str).where(~whole, numbers.where(whole, 0).astype('int64').astype(str))
+    return text.mask(blank).astype("string")
+
+
+# Widen compact number types (see utils.readers.compact_columns) back to the 64-bit ones the
+# outputs are written with
+def _widen(numbers):
+    if pd.api.types.is_integer_dtype(numbers.dtype):
+        return numbers.astype('int64')
+    if pd.api.types.is_float_dtype(numbers.dtype):
+        return numbers.astype('float64')
+    return numbers
+
+
+# Function to give a frame real column types for CSV/Parquet output. Columns listed in dtypes
+# ("date", "number" or "integer") are converted when every non-blank value converts; "text"
+# columns and other columns holding a mix of types become strings.
+def typed_columns(df, dtypes):
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        dtype = dtypes.get(col)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # written as plain values; the object array points at the categories' strings, so it
+            # costs one pointer per row
+            values = values.astype(object)
+        if dtype in ("number", "integer", "text"):
+            blank = values.isna() | values.astype(str).str.strip().eq('')
+
+        if dtype == "date":
+            dates, failed = parse_dates(values)
+            if not failed:
+                columns[col] = dates.astype(pd.ArrowDtype(pa.date32()))
+                continue
+        elif dtype in ("number", "integer"):
+            numbers = _widen(pd.to_numeric(values.mask(blank), errors='coerce'))
+            if not (numbers.isna() & ~blank).any():
+                if dtype == "integer" and (numbers.dropna() % 1 == 0).all():
+                    numbers = numbers.astype("Int64")
+                columns[col] = numbers
+                continue
+        elif dtype == "text":
+            columns[col] = text_values(values, blank)
+            continue
+
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        if values.dtype != object or kind in ("string", "empty"):
+            columns[col] = values
+        elif kind == "boolean":
+            columns[col] = values.astype("boolean")
+        elif kind in ("integer", "floating", "mixed-integer-float", "decimal"):
+            columns[col] = pd.to_numeric(values)
+        else:
+            columns[col] = values.astype("string")
+
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+# Function to write a DataFrame as UTF-8 CSV to a binary file object, a chunk at a time
+def write_csv(file, df, progress=None):
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    for start in range(0, max(len(df), 1), CHUNK_ROWS):
+        df.iloc[start:start + CHUNK_ROWS].to_csv(text, index=False, header=start == 0)
+        if progress is not None:
+            progress(min(start + CHUNK_ROWS, len(df)))
+    text.flush()
+    text.detach()
+
+
+# Function to write a DataFrame as Parquet to a binary file object, one row group per chunk
+def write_parquet(file, df, progress=None):
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(file, schema) as writer:
+        for start in range(0, max(len(df), 1), CHUNK_ROWS):
+            chunk = df.iloc[start:start + CHUNK_ROWS]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            if progress is not None:
+                progress(min(start + CHUNK_ROWS, len(df)))
+
+
+# Function to name an output file for a format (e.g. x_clean_SEND.xlsx -> x_clean_SEND.parquet)
+def output_filename(filename, file_format):
+    return f"{os.path.splitext(filename)[0]}.{file_format}"
+
+
+# Function to write a DataFrame in any output format as an entry streamed into an open ZipFile;
+# CSV entries are deflated (XLSX and Parquet are already compressed)
+def write_to_zip(zip_file, filename, df, file_format, progress=None):
+    if file_format == "xlsx":
+        write_xlsx_to_zip(zip_file, filename, df, progress=progress)
+        return
+
+    entry_info = zipfile.ZipInfo(filename, date_time=time.localtime()[:6])
+    entry_info.compress_type = zipfile.ZIP_DEFLATED if file_format == "csv" else zip_file.compression
+    with zip_file.open(entry_info, 'w', force_zip64=True) as entry:
+        if file_format == "csv":
+            write_csv(entry, df, progress)
+        else:
+            write_parquet(entry, df, progress)
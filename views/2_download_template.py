@@ -1,6 +1,6 @@
 import streamlit as st
-import pandas as pd
-import io
+from utils.schema import SERVICE_CATEGORIES
+from utils.templates import DEFAULT_ROWS, MAX_ROWS, get_template
 
 # set page configuration
 st.set_page_config(
@@ -37,7 +37,7 @@ st.markdown(f'''
 # instructional text
 st.markdown(f'''
     <p style="font-size: 23px; font-weight: 200; text-align: left;">
-        Please select a service category to download the corresponding template to use for your reporting. The template comes with Column A populated down to 50 rows. If you have fewer than 50 rows of data to report, you can delete the extra rows.
+        Please select a service category to download the corresponding template to use for your reporting. Column A of the template is filled in down to the number of rows you choose below (50 by default). If you have fewer rows of data to report, you can delete the extra rows.
     </p>
 ''', unsafe_allow_html=True)
 
@@ -47,105 +47,30 @@ service_rendered = st.selectbox(
     index=None,
     label="hi",
     label_visibility='hidden',
-    options=[
-        "New Units Produced",
-        "Housing Counseling",
-        "Down Payment Assistance",
-        "Home Rehabilitation",
-        "Legacy Resident Tax Relief",
-        "Heirs Property Resolution",
-        "Education",
-        "CDFI Activity",
-    ],
+    options=SERVICE_CATEGORIES,
+)
+
+# number of rows with Column A filled in
+rows_in_spreadsheet = st.number_input(
+    "Rows to fill in",
+    min_value=1,
+    max_value=MAX_ROWS,
+    value=DEFAULT_ROWS,
+    step=50,
+    help=f"Column A is filled in with the service category down to this row (up to {MAX_ROWS:,} rows). "
+         "Dropdowns work on every row, so you can also add rows beyond it.",
 )
 st.write("")
 st.write("")
 st.write("")
 
-# define the columns & widths in the spreadsheet
-columns_to_keep = {
-    "Service": 20,
-    "Submitting Organization": 25,
-    "Service Completion Date": 20,
-}
-
-# Add Counseling Service Rendered column for Housing Counseling template
-if service_rendered == "Housing Counseling":
-    columns_to_keep["Counseling Service Rendered"] = 25
-
-# Continue with remaining columns
-columns_to_keep.update({
-    "Name": 20,
-    "Date of Birth": 15,
-    "Street Address": 35,
-    "Unit (if applicable)": 20,
-    "County": 15,
-    "ZIP": 8,
-    "Race": 10,
-    "Ethnicity": 10,
-    "Primary Language": 15,
-    "Gender": 10,
-    "HH Income": 15,
-    "HH Size": 15,
-})
-
-# Add homeowner fields based on template type
-if service_rendered == "Education":
-    columns_to_keep["1st Time Home Buyer (Y/N)"] = 22
-else:
-    columns_to_keep["Existing Homeowner (Y/N)"] = 22
-    columns_to_keep["First-Generation Homeowner (Y/N)"] = 28
-
-# Add has_sold for New Units Produced only
-if service_rendered == "New Units Produced":
-    columns_to_keep["Has Sold?"] = 12
-
-# auto-fill the first N rows
-rows_in_spreadsheet = 50
-
-data = {"Service": [service_rendered] * rows_in_spreadsheet}
-for col in columns_to_keep.keys():
-    if col != "Service":  # Add other columns as empty
-        data[col] = ["" for _ in range(rows_in_spreadsheet)]
-df = pd.DataFrame(data)
-
-buffer = io.BytesIO()
-
-# Write the DataFrame to the buffer using ExcelWriter
-with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-    df.to_excel(writer, index=False, sheet_name='Sheet1')
-
-    # Access the workbook and worksheet objects
-    workbook = writer.book
-    worksheet = writer.sheets['Sheet1']
-
-    # Set column widths
-    for col_num, (col_name, width) in enumerate(columns_to_keep.items()):
-        worksheet.set_column(col_num, col_num, width)
-
-    # Add data validation for Counseling Service Rendered column in Housing Counseling template
-    if service_rendered == "Housing Counseling":
-        counseling_service_col = list(columns_to_keep.keys()).index("Counseling Service Rendered")
-        worksheet.data_validation(1, counseling_service_col, rows_in_spreadsheet, counseling_service_col, {
-            'validate': 'list',
-            'source': ['Home Purchase', 'Foreclosure Prevention', 'Mortgage Default', 'Rental Counseling', 'Other']
-        })
-
-    # Add True/False dropdown validation for has_sold in New Units Produced template
-    if service_rendered == "New Units Produced":
-        has_sold_col = list(columns_to_keep.keys()).index("Has Sold?")
-        worksheet.data_validation(1, has_sold_col, rows_in_spreadsheet, has_sold_col, {
-            'validate': 'list',
-            'source': ['TRUE', 'FALSE']
-        })
-
-# Download button
+# Download button (template bytes are built once per process and cached)
 if service_rendered:
     service_rendered_no_spaces = service_rendered.replace(" ", "")
     file_name = f"{service_rendered_no_spaces}_template.xlsx"
     st.download_button(
         label=f"Download Template for {service_rendered}",
-        data=buffer,
+        data=get_template(service_rendered, int(rows_in_spreadsheet)),
         file_name=file_name,
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
@@ -1,9 +1,14 @@
 import streamlit as st
-import pandas as pd
 import io
-import zipfile
-from datetime import datetime
-from pytz import timezone
+import threading
+import time
+from collections import namedtuple
+from utils.cache import LRUCache, content_hash
+from utils.diagnostics import Diagnostics, peak_rss_mb
+from utils.jobs import Job, JobGroup, create_executor
+from utils.schema import DEFAULT_FORMATS, OUTPUT_FORMATS
+# pandas, pyarrow and the scrubbing modules are imported in the functions that use them, once a
+# file is uploaded, so the page renders without them (utils/warmup.py loads them in the background)
 
 # set page configuration
 st.set_page_config(
@@ -41,6 +46,22 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# the dropzone text changes when several files can be uploaded
+if st.session_state.get("multi_upload"):
+    st.markdown(
+        """
+        <style>
+            div[data-testid="stFileUploaderDropzoneInstructions"]>div>span::before {
+                content: "Drag & drop completed Excel templates for cleaning.";
+            }
+            div[data-testid="stFileUploaderDropzoneInstructions"]>div>small::before {
+                content: "Add one or more files.";
+            }
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
+
 # top of page spacing
 st.write("")
 
@@ -59,297 +80,356 @@ st.markdown(f'''
 ''', unsafe_allow_html=True)
 
 
-# Function to scrub data
-def scrub_data(df, original_filename, service_type):
-    # Initialize warnings list
-    warnings = []
-    
-    # Validate date columns before processing
-    try:
-        # Convert 'Date of Birth' to datetime with error handling - this is non-critical
-        df['Date of Birth'] = pd.to_datetime(df['Date of Birth'], errors='coerce')
-        # # Check if any dates couldn't be parsed
-        # if df['Date of Birth'].isna().any():
-        #     invalid_dob_rows = df[df['Date of Birth'].isna()].index.tolist()
-        #     warnings.append(f"Warning: Invalid date format found in 'Date of Birth' column. While not essential, this field is used to generate a unique ID for each record. This unique ID can still be generatged, but it will not be based on accurate, record-level information for that individual. Proceed with caution!")
-            
-        #     # For missing Date of Birth values, set a default date to allow processing to continue
-        #     df.loc[df['Date of Birth'].isna(), 'Date of Birth'] = pd.Timestamp('1900-01-01')
-
-        # clean up the 'Service Completion Date' column
-        df['Service Completion Date'] = df['Service Completion Date'].astype(str).str.strip()
-        df['Service Completion Date'] = df['Service Completion Date'].replace(['', ' ', 'nan', 'None', 'N/A'], pd.NaT)
-
-        # Convert 'Service Completion Date' to datetime with error handling - this is critical
-        df['Service Completion Date'] = pd.to_datetime(df['Service Completion Date'], errors='coerce')
-        # if df['Service Completion Date'].isna().any():
-        #     invalid_scd_rows = df[df['Service Completion Date'].isna()].index.tolist()
-        #     error_msg = f"Invalid date format found in 'Service Completion Date' column. Please check your data and upload again with this column filled in with proper date formatting."
-        #     return None, None, None, None, error_msg, warnings
-    
-        reference_date = pd.Timestamp('1920-01-02')
-        days_old = ((df['Date of Birth'] -
-                    reference_date).dt.days).astype(str).apply(lambda x: x[::2])
-    
-        name_format = df['Name'].astype(str).str.replace(
-            ' ', '', regex=True).str.lower().apply(lambda x: x[1:][::3]).str[:4].str.ljust(4, 'x')
-    
-        df['Unique ID'] = name_format.astype(str) + "-" + days_old.astype(str)
-    
-        # Zero-pad all values in 'Unique ID' to the same length as the max value
-        max_length = df['Unique ID'].str.len().max()
-        df['Unique ID'] = df['Unique ID'].apply(lambda x: x.ljust(max_length, '0'))
-    
-        # Calculate number of non-null 'Name' values
-        valid_count = df['Name'].notna().sum()
-    
-        # Truncate the 'Service' and 'Unique ID' columns
-        df.loc[valid_count:, ['Service', 'Unique ID']] = None
-    
-        # Properly format the dates
-        df['Service Completion Date'] = df['Service Completion Date'].dt.strftime('%m/%d/%Y')
-        df['Date of Birth'] = df['Date of Birth'].dt.strftime('%m/%d/%Y')
-    
-        # Create two versions of the DataFrame
-        keep_df = df.copy()
-        send_df = df.drop(columns=['Name', 'Date of Birth',
-                        'Street Address', 'Unit (if applicable)'])
-
-        # Build column order dynamically based on service type
-        keep_columns = [
-            "Service",
-            "Submitting Organization",
-            "Service Completion Date",
-        ]
-
-        # Add service-specific column for Housing Counseling
-        if service_type == "Housing Counseling":
-            keep_columns.append("Counseling Service Rendered")
-
-        keep_columns.extend([
-            "Unique ID",
-            "Name",
-            "Date of Birth",
-            "Street Address",
-            "Unit (if applicable)",
-            "County",
-            "ZIP",
-        ])
-
-        for col in ["Race", "Ethnicity", "Primary Language", "Gender"]:
-            if col in df.columns:
-                keep_columns.append(col)
-
-        keep_columns.extend([
-            "HH Income",
-            "HH Size",
-        ])
-
-        # Add ending columns based on template type
-        if service_type == "Education":
-            keep_columns.append("1st Time Home Buyer (Y/N)")
-        else:
-            keep_columns.extend([
-                "Existing Homeowner (Y/N)",
-                "First-Generation Homeowner (Y/N)"
-            ])
+# Shared (cross-session) cache of parsed uploads and finished ZIPs, keyed by content hash
+@st.cache_resource
+def get_result_cache():
+    return LRUCache()
 
-        if service_type == "New Units Produced":
-            keep_columns.append("Has Sold?")
-
-        # Build send columns (excluding PII)
-        send_columns = [
-            "Service",
-            "Submitting Organization",
-            "Service Completion Date",
-        ]
-
-        if service_type == "Housing Counseling":
-            send_columns.append("Counseling Service Rendered")
-
-        send_columns.extend([
-            "Unique ID",
-            "County",
-            "ZIP",
-        ])
-
-        for col in ["Race", "Ethnicity", "Primary Language", "Gender"]:
-            if col in df.columns:
-                send_columns.append(col)
-
-        send_columns.extend([
-            "HH Income",
-            "HH Size",
-        ])
-
-        if service_type == "Education":
-            send_columns.append("1st Time Home Buyer (Y/N)")
-        else:
-            send_columns.extend([
-                "Existing Homeowner (Y/N)",
-                "First-Generation Homeowner (Y/N)"
-            ])
 
-        if service_type == "New Units Produced":
-            send_columns.append("Has Sold?")
-
-        # Append any extra columns (not in the standard template) at the end of both outputs
-        extra_cols = [col for col in df.columns if col not in keep_columns]
-        keep_columns.extend(extra_cols)
-        send_columns.extend(extra_cols)
-
-        # Rearrange columns
-        keep_df = keep_df[keep_columns]
-        send_df = send_df[send_columns]
-    
-        # Save both DataFrames to Excel files in memory buffers
-        keep_buffer = io.BytesIO()
-        keep_filename = f"{original_filename.split('.')[0]}_clean_KEEP.xlsx"
-        with pd.ExcelWriter(keep_buffer, engine='xlsxwriter') as writer:
-            keep_df.to_excel(writer, index=False, sheet_name='Data')
-            writer.sheets['Data'].autofit()
-        keep_buffer.seek(0)
-    
-        send_buffer = io.BytesIO()
-        send_filename = f"{original_filename.split('.')[0]}_clean_SEND.xlsx"
-        with pd.ExcelWriter(send_buffer, engine='xlsxwriter') as writer:
-            send_df.to_excel(writer, index=False, sheet_name='Data')
-            writer.sheets['Data'].autofit()
-        send_buffer.seek(0)
-    
-        return keep_buffer, keep_filename, send_buffer, send_filename, None, warnings
-    
-    except Exception as e:
-        return None, None, None, None, f"An error occurred during data processing: {str(e)}", warnings
+# Function to hash an upload once per session (reruns with the same file reuse the digest)
+def upload_digest(uploaded_file):
+    digests = st.session_state.setdefault("upload_digests", {})
+    if uploaded_file.file_id not in digests:
+        digests[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+    return digests[uploaded_file.file_id]
 
 
-# Streamlit App
-def main():
+# Lock shared by every session around loading secrets: with no secrets file, concurrent
+# st.secrets.load_if_toml_exists calls can show one session another's "No secrets found" error
+@st.cache_resource
+def get_secrets_lock():
+    return threading.Lock()
 
-    # Base columns shared by all templates
-    base_columns = [
-        "Service",
-        "Submitting Organization",
-        "Service Completion Date",
-    ]
-
-    # Common columns after service-specific ones
-    common_columns = [
-        "Name",
-        "Date of Birth",
-        "Street Address",
-        "Unit (if applicable)",
-        "County",
-        "ZIP",
-        "HH Income",
-        "HH Size",
-    ]
-
-    # Default ending columns for most templates
-    default_ending_columns = [
-        "Existing Homeowner (Y/N)",
-        "First-Generation Homeowner (Y/N)"
-    ]
-
-    # Function to build expected columns based on service type
-    def get_expected_columns(service_type):
-        columns = base_columns.copy()
-
-        # Add service-specific column for Housing Counseling
-        if service_type == "Housing Counseling":
-            columns.append("Counseling Service Rendered")
-
-        # Add common columns
-        columns.extend(common_columns)
-
-        # Add ending columns based on template type
-        if service_type == "Education":
-            columns.append("1st Time Home Buyer (Y/N)")
-        else:
-            columns.extend(default_ending_columns)
-
-        if service_type == "New Units Produced":
-            columns.append("Has Sold?")
-
-        return columns
 
-    # File upload widget
-    uploaded_file = st.file_uploader(
-        label="Choose completed reporting template",
-        label_visibility='collapsed',
-        accept_multiple_files=False,
-        help="Upload the completed Excel template you downloaded from Page 2 of this web application."
-    )
+# Function to check whether a secrets file exists (loading it if so), one session at a time
+def secrets_exist():
+    with get_secrets_lock():
+        return st.secrets.load_if_toml_exists()
+
+
+# Function to check whether the diagnostics panel is enabled (?diagnostics=1 or a secrets flag)
+def diagnostics_enabled():
+    if st.query_params.get("diagnostics", "").lower() in ("1", "true", "yes"):
+        return True
+    return secrets_exist() and bool(st.secrets.get("diagnostics", False))
+
+
+# Fingerprints of the previous submission used in delta mode, with the digest of its file
+PreviousSubmission = namedtuple("PreviousSubmission", ["digest", "fingerprints"])
+
+
+# Function to load the previous submission's fingerprints (once per file, cached like uploads)
+def load_previous(previous_file, diagnostics):
+    from utils.delta import load_fingerprints
+
+    digest = upload_digest(previous_file)
+    result_cache = get_result_cache()
+    fingerprints = result_cache.get(("previous", digest))
+    if fingerprints is None:
+        with diagnostics.stage("load_previous", file_mb=round(previous_file.size / 2**20, 2)) as stage, \
+                st.spinner("Reading your previous submission..."):
+            try:
+                fingerprints = load_fingerprints(previous_file)
+            except Exception as e:
+                st.error(f"Could not read the previous submission: {str(e)}")
+                st.stop()
+            stage["rows"] = len(fingerprints)
+        result_cache.put(("previous", digest), fingerprints)
+    return PreviousSubmission(digest, fingerprints)
+
+
+# Function to get the Unique ID index file set in secrets (id_index = "path/to/index.sqlite"), if any
+def id_index_path():
+    return st.secrets.get("id_index") if secrets_exist() else None
+
+
+# Function to show per-stage timings and memory in a collapsible panel
+def show_diagnostics(diagnostics, job=None):
+    stages = diagnostics.stages + (job.stages if job is not None else [])
+    with st.expander("Diagnostics"):
+        st.caption(f"Total: {sum(stage['seconds'] for stage in stages):.2f}s · Peak RSS: {peak_rss_mb()} MB")
+        st.dataframe(stages, hide_index=True, use_container_width=True)
 
-    if uploaded_file:
-        # Read uploaded file into DataFrame
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(".xlsx"):
-            df = pd.read_excel(uploaded_file)
-        else:
-            st.error(
-                "File format not supported! Please upload a CSV or Excel file.")
+
+# Bounded worker pool shared by every session, so concurrent uploads don't block each other
+@st.cache_resource
+def get_executor():
+    return create_executor()
+
+
+# Function to parse, scrub and zip an upload on the worker pool (no st.* calls in here)
+def run_scrub_job(uploaded_file, digest, formats, previous, result_cache, id_index, job):
+    from utils.delta import Delta
+    from utils.scrub import UploadError, load_upload, package_zip, scrub_data, validate_upload
+
+    zip_key = ("zip", digest, uploaded_file.name, formats, previous.digest if previous else None)
+    cached_zip = result_cache.get(zip_key)
+    if cached_zip is not None:
+        return cached_zip
+
+    start = time.perf_counter()
+    df_key = ("df", digest, uploaded_file.name)
+    cached_df = result_cache.get(df_key)
+    if cached_df is None:
+        service_type, df = load_upload(uploaded_file, job)
+        result_cache.put(df_key, (service_type, df))
+    else:
+        service_type, df = cached_df
+
+    # Flag rows whose values don't match the template (reported, but still scrubbed)
+    issues, validation_warnings = validate_upload(df, service_type, job)
+
+    # scrub_data leaves the cached frame unchanged, so it can be scrubbed directly
+    # in delta mode, only rows new or changed since the previous submission are scrubbed
+    delta = Delta(previous.fingerprints) if previous else None
+    keep_df, keep_filename, send_df, send_filename, error_msg, warnings = scrub_data(
+        df, uploaded_file.name, service_type, job, id_index, delta)
+    if error_msg:
+        raise UploadError(error_msg)
+
+    # Create a ZIP file, streaming each output file directly into its entry
+    keep_formats, send_formats = formats
+    zip_buffer = io.BytesIO()
+    try:
+        package_zip(zip_buffer, keep_df, keep_filename, send_df, send_filename, job, keep_formats, send_formats,
+                    delta.fingerprints if delta else None)
+    except Exception as e:
+        raise UploadError(f"An error occurred during data processing: {str(e)}") from e
+
+    result = {
+        "zip": zip_buffer.getvalue(),
+        "warnings": validation_warnings + warnings,
+        "issues": issues,
+        "service": service_type,
+        "rows": len(df),
+        "seconds": time.perf_counter() - start,
+    }
+    result_cache.put(zip_key, result)
+    return result
+
+
+# Live progress bar for the session's running job; reruns the page once the job finishes
+@st.fragment(run_every=0.5)
+def show_job_progress():
+    job = st.session_state.get("scrub_job")
+    if job is None:
+        return
+    if job.done():
+        st.rerun()
+    st.progress(job.fraction, text=job.status_text)
+
+
+# Function to show a finished scrub's warnings and failing rows (labelled with the file when there are several)
+def show_warnings(warnings, issues, filename=None):
+    # Display any warnings
+    for warning in warnings:
+        st.warning(f"{filename}: {warning}" if filename else warning)
+
+    # List every failing cell so rows can be fixed in the source data
+    if len(issues):
+        with st.expander(f"Rows needing attention{f' in {filename}' if filename else ''} ({len(issues):,})"):
+            st.dataframe(issues, hide_index=True, use_container_width=True)
+
+
+# Function to scrub one upload into a KEEP/SEND ZIP
+def scrub_single(uploaded_file, formats, previous, job, diagnostics):
+    from utils.scrub import UploadError, zip_file_name
+
+    if not uploaded_file.name.endswith((".csv", ".xlsx")):
+        st.error(
+            "File format not supported! Please upload a CSV or Excel file.")
+        st.stop()
+
+    # Reruns with the same file (including clicking the download button) reuse the
+    # finished ZIP instead of running the whole pipeline again
+    result_cache = get_result_cache()
+    with diagnostics.stage("hash", file_mb=round(uploaded_file.size / 2**20, 2)):
+        digest = upload_digest(uploaded_file)
+    with diagnostics.stage("cache_lookup") as stage:
+        zip_key = ("zip", digest, uploaded_file.name, formats, previous.digest if previous else None)
+        result = result_cache.get(zip_key)
+        stage["hit"] = result is not None
+
+    # A different file was uploaded, so cancel the job still working on the old one
+    if job is not None and job.key != zip_key:
+        job.cancel()
+        job = None
+
+    if result is None:
+        # Scrub on the worker pool and show progress until the job finishes
+        if job is None:
+            job = Job(zip_key, file=uploaded_file.name).submit(
+                get_executor(), run_scrub_job, uploaded_file, digest, formats, previous, result_cache, id_index_path())
+            st.session_state["scrub_job"] = job
+
+        if not job.done():
+            show_job_progress()
+            return job
+
+        try:
+            result = job.result()
+        except UploadError as e:
+            st.error(str(e))
             st.stop()
 
-        # Detect service type from uploaded data
-        service_type = None
-        if "Service" in df.columns and len(df) > 0:
-            service_type = df["Service"].dropna().iloc[0] if not df["Service"].dropna().empty else None
-
-        # Get expected columns based on service type
-        expected_columns = get_expected_columns(service_type)
-
-        # Validate column names
-        uploaded_columns = list(df.columns)
-        missing_columns = [
-            col for col in expected_columns if col not in uploaded_columns]
-        extra_columns = [
-            col for col in uploaded_columns if col not in expected_columns]
-
-        if missing_columns:
-            st.error(
-                f"Uploaded file missing the following column(s): {', '.join(missing_columns)}. Please modify your source data and upload again!"
-            )
+    show_warnings(result["warnings"], result["issues"])
+
+    # Provide the ZIP download button
+    st.download_button(
+        label="Scrub & Download",
+        data=result["zip"],
+        file_name=zip_file_name(uploaded_file.name),
+        mime="application/zip",
+    )
+    return job
+
+
+# Function to scrub several uploads concurrently into one ZIP with a folder per file and a manifest
+def scrub_multiple(uploaded_files, formats, previous, job, diagnostics):
+    from utils.scrub import UploadError, check_upload, package_combined_zip, zip_file_name
+
+    unsupported = [file.name for file in uploaded_files if not file.name.endswith((".csv", ".xlsx"))]
+    if unsupported:
+        st.error(f"File format not supported: {', '.join(unsupported)}. Please upload CSV or Excel files.")
+        st.stop()
+
+    filenames = [file.name for file in uploaded_files]
+    result_cache = get_result_cache()
+    with diagnostics.stage("hash", files=len(uploaded_files),
+                           file_mb=round(sum(file.size for file in uploaded_files) / 2**20, 2)):
+        digests = [upload_digest(file) for file in uploaded_files]
+    with diagnostics.stage("cache_lookup") as stage:
+        combined_key = ("combined", tuple(digests), tuple(filenames), formats, previous.digest if previous else None)
+        combined = result_cache.get(combined_key)
+        stage["hit"] = combined is not None
+
+    # The set of files changed, so cancel the jobs still working on the old ones
+    if job is not None and job.key != combined_key:
+        job.cancel()
+        job = None
+
+    if combined is None:
+        if job is None:
+            # Check every file's columns before scrubbing any of them
+            errors = []
+            with diagnostics.stage("peek_validate", files=len(uploaded_files)):
+                for file in uploaded_files:
+                    try:
+                        check_upload(file)
+                    except UploadError as e:
+                        errors.append(f"**{file.name}**: {e}")
+            if errors:
+                st.error("\n\n".join(errors))
+                st.stop()
+
+            # Scrub every file on the worker pool at once
+            executor = get_executor()
+            id_index = id_index_path()
+            job = JobGroup(combined_key, [
+                Job(("zip", digest, file.name, formats, previous.digest if previous else None), file=file.name).submit(
+                    executor, run_scrub_job, file, digest, formats, previous, result_cache, id_index)
+                for file, digest in zip(uploaded_files, digests)
+            ])
+            st.session_state["scrub_job"] = job
+
+        if not job.done():
+            show_job_progress()
+            return job
+
+        results, errors = [], []
+        for file, file_job in zip(uploaded_files, job.jobs):
+            try:
+                results.append(file_job.result())
+            except UploadError as e:
+                errors.append(f"**{file.name}**: {e}")
+        if errors:
+            st.error("\n\n".join(errors))
             st.stop()
 
+        with diagnostics.stage("combine", files=len(results)):
+            zip_buffer = io.BytesIO()
+            manifest = package_combined_zip(zip_buffer, filenames, results)
+        combined = {"zip": zip_buffer.getvalue(), "manifest": manifest, "results": results}
+        result_cache.put(combined_key, combined)
+
+    st.dataframe(combined["manifest"], hide_index=True, use_container_width=True)
+
+    # Display each file's warnings
+    for filename, result in zip(filenames, combined["results"]):
+        show_warnings(result["warnings"], result["issues"], filename)
+
+    # Provide the ZIP download button
+    st.download_button(
+        label="Scrub & Download",
+        data=combined["zip"],
+        file_name=zip_file_name(f"{len(filenames)}_templates"),
+        mime="application/zip",
+    )
+    return job
 
-        # Button to scrub and download data
-        tz = timezone("America/New_York")
-        timestamp = datetime.now(tz).strftime("%m-%d-%Y_%I.%M%p")
-        zip_file_name = f"{uploaded_file.name.split('.')[0]}_cleaned_{timestamp}.zip"
 
-        # Scrub data and package into ZIP
-        def scrub_and_package():
-            keep_buffer, keep_filename, send_buffer, send_filename, error_msg, warnings = scrub_data(
-                df, uploaded_file.name, service_type)
+# Streamlit App
+def main():
 
-            # Display any warnings first
-            for warning in warnings:
-                st.warning(warning)
+    # Several templates (e.g. one per service category) can be scrubbed into one ZIP
+    multiple = st.toggle(
+        "Upload several templates at once",
+        key="multi_upload",
+        help="Scrub several completed templates together and download one ZIP with a folder for each file."
+    )
 
-            # If there's an error, display it and return None
-            if error_msg:
-                st.error(error_msg)
-                return None
+    # KEEP/SEND file formats; CSV and Parquet skip the (much slower) spreadsheet writer
+    with st.expander("Output formats"):
+        keep_formats = st.multiselect("KEEP file", OUTPUT_FORMATS, default=DEFAULT_FORMATS,
+                                      format_func=str.upper, key="keep_formats")
+        send_formats = st.multiselect("SEND file", OUTPUT_FORMATS, default=DEFAULT_FORMATS,
+                                      format_func=str.upper, key="send_formats",
+                                      help="Parquet and CSV load much faster than Excel for aggregation.")
+    formats = (tuple(f for f in OUTPUT_FORMATS if f in keep_formats),
+               tuple(f for f in OUTPUT_FORMATS if f in send_formats))
+
+    # Delta mode: rows unchanged since a previous submission are left out of the outputs
+    with st.expander("Only new or changed rows"):
+        previous_file = st.file_uploader(
+            "Previous submission",
+            type=["zip", "xlsx", "csv", "parquet"],
+            key="previous_submission",
+            help="The ZIP downloaded for your last submission, or its KEEP or fingerprints file. "
+                 "Only rows that are new or changed since then are scrubbed and included in the download."
+        )
 
-            # Create a ZIP file
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w") as zip_file:
-                zip_file.writestr(keep_filename, keep_buffer.getvalue())
-                zip_file.writestr(send_filename, send_buffer.getvalue())
-            zip_buffer.seek(0)
-            return zip_buffer
-
-        # Provide the ZIP download button
-        zip_data = scrub_and_package()
-        if zip_data is not None:
-            st.download_button(
-                label="Scrub & Download",
-                data=zip_data,
-                file_name=zip_file_name,
-                mime="application/zip",
-            )
+    # File upload widget
+    uploaded = st.file_uploader(
+        label="Choose completed reporting template",
+        label_visibility='collapsed',
+        accept_multiple_files=multiple,
+        help="Upload the completed Excel template you downloaded from Page 2 of this web application."
+    )
+
+    # Background scrub job for this session, if any
+    job = st.session_state.get("scrub_job")
+
+    if not uploaded and job is not None:
+        # the file was removed, so stop working on it
+        job.cancel()
+        del st.session_state["scrub_job"]
+
+    if uploaded and not all(formats):
+        st.error("Choose at least one format for each of the KEEP and SEND files.")
+        st.stop()
+
+    if uploaded:
+        # Record per-stage timings and memory (always logged; shown in the app when enabled)
+        diagnostics = Diagnostics(file=", ".join(file.name for file in uploaded) if multiple else uploaded.name)
+        try:
+            previous = load_previous(previous_file, diagnostics) if previous_file else None
+            if multiple:
+                job = scrub_multiple(uploaded, formats, previous, job, diagnostics)
+            else:
+                job = scrub_single(uploaded, formats, previous, job, diagnostics)
+        finally:
+            if diagnostics_enabled():
+                show_diagnostics(diagnostics, job)
 
 
 main()
@@ -0,0 +1,117 @@
+import streamlit as st
+import io
+import pyarrow.parquet as pq
+from utils.consolidate import DATASET_SCHEMA, SEND_EXTENSIONS, UniqueIdIndex, consolidate
+
+# set page configuration
+st.set_page_config(
+    layout='centered',
+    initial_sidebar_state="expanded"
+)
+
+# Custom CSS
+st.markdown(
+    """
+    <style>
+        [data-testid="stFileUploaderDropzone"] {
+            background-color: #FFFFF6;
+            border-radius: 15px;
+            border: 1px solid #1F2041;
+            padding: 15px; /* Optional: Add some padding */
+        }
+        div[data-testid="stFileUploaderDropzoneInstructions"]>div>span {
+            visibility: hidden;
+        }
+        div[data-testid="stFileUploaderDropzoneInstructions"]>div>span::before {
+            content: "Drag & drop SEND files or downloaded ZIPs.";
+            visibility: visible;
+        }
+        .stDownloadButton, div.stButton {text-align:center}
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+# top of page spacing
+st.write("")
+
+# title text
+st.markdown(f'''
+    <p style="font-size: 40px; font-weight: 900; text-align: center; margin-bottom: 30px;">
+        Consolidate SEND Files
+    </p>
+''', unsafe_allow_html=True)
+
+# instructional text
+st.markdown(f'''
+    <p style="font-size: 23px; font-weight: 200; text-align: left;">
+        Upload the SEND files received from participating organizations, or the ZIPs downloaded from Page 3. They are combined into one Parquet file, and every row is flagged if it duplicates an earlier row or belongs to a participant already seen. <i>To add to an earlier consolidation, upload its Parquet file along with the new SEND files; its rows keep their flags.</i>
+    </p>
+''', unsafe_allow_html=True)
+
+
+# Function to consolidate the uploaded files into Parquet bytes, the per-file report and the
+# repeat participants
+def run_consolidation(uploaded_files):
+    status = st.empty()
+
+    def progress(rows):
+        status.caption(f"Consolidating... {rows:,} rows")
+
+    buffer = io.BytesIO()
+    index = UniqueIdIndex()
+    with pq.ParquetWriter(buffer, DATASET_SCHEMA) as writer:
+        report = consolidate(uploaded_files, writer, index, progress)
+    status.empty()
+
+    return {"parquet": buffer.getvalue(), "report": report, "participants": index.repeat_participants()}
+
+
+def main():
+    uploaded_files = st.file_uploader(
+        label="Choose SEND files",
+        label_visibility='collapsed',
+        type=[extension.lstrip(".") for extension in SEND_EXTENSIONS],
+        accept_multiple_files=True,
+        help="SEND files (.xlsx, .csv or .parquet), ZIPs downloaded from Page 3, or an earlier consolidated file."
+    )
+    if not uploaded_files:
+        st.session_state.pop("consolidation", None)
+        return
+
+    # reruns (e.g. clicking a download button) reuse the result for the same files
+    key = tuple(file.file_id for file in uploaded_files)
+    result = st.session_state.get("consolidation")
+    if result is None or result["key"] != key:
+        result = {"key": key, **run_consolidation(uploaded_files)}
+        st.session_state["consolidation"] = result
+
+    report = result["report"]
+    for entry in report[report["Error"].notna()].to_dict("records"):
+        st.error(f"{entry['File']}: {entry['Error']}")
+
+    consolidated = report[report["Error"].isna()]
+    if consolidated.empty:
+        return
+
+    st.success(f"Consolidated {int(consolidated['Rows'].sum()):,} rows from {len(consolidated)} SEND file(s): "
+               f"{int(consolidated['Duplicates'].sum()):,} duplicate row(s) and "
+               f"{len(result['participants']):,} participant(s) seen more than once.")
+    st.dataframe(consolidated.drop(columns="Error"), hide_index=True)
+
+    st.download_button(
+        label="Download Consolidated Data",
+        data=result["parquet"],
+        file_name="consolidated_SEND.parquet",
+        mime="application/vnd.apache.parquet",
+    )
+    if not result["participants"].empty:
+        st.download_button(
+            label="Download Repeat Participants",
+            data=result["participants"].to_csv(index=False).encode("utf-8"),
+            file_name="repeat_participants.csv",
+            mime="text/csv",
+        )
+
+
+main()